@@ -0,0 +1,90 @@
+import time
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (JWTAuthentication as BaseJWTAuthentication,
+                                                     JWTStatelessUserAuthentication)
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from store.caching import get_version
+
+
+def _revocation_key(user_id):
+    return f'core:jwt:revoked:{user_id}'
+
+
+def revoke_tokens(user_id):
+    """
+    Rejects every token issued to the user before now, access and refresh alike.
+    The user has to log in again.
+
+    The revocation is kept in the cache, which must be shared by every process
+    (see CACHES in storefront/settings.py).
+    """
+    lifetime = max(api_settings.ACCESS_TOKEN_LIFETIME, api_settings.REFRESH_TOKEN_LIFETIME)
+    cache.set(_revocation_key(user_id), int(time.time()), int(lifetime.total_seconds()))
+
+
+def is_revoked(token):
+    revoked_at = cache.get(_revocation_key(token.get(api_settings.USER_ID_CLAIM)))
+    # "iat" is in whole seconds: a token issued in the second of the revocation is kept,
+    # or logging in again right after a revocation would be rejected too.
+    return revoked_at is not None and token.get('iat', 0) < revoked_at
+
+
+class ClaimsTokenUser(TokenUser):
+    """
+    A user built from the claims added by core.serializers.TokenObtainPairSerializer.
+    Permission checks read the permissions the user had when logging in.
+    """
+
+    @cached_property
+    def customer_id(self):
+        return self.token.get('customer_id')
+
+    @cached_property
+    def perms(self):
+        return frozenset(self.token.get('perms', ()))
+
+    def get_all_permissions(self, obj=None):
+        return set(self.perms) if obj is None else set()
+
+    def has_perm(self, perm, obj=None):
+        return self.is_superuser or (obj is None and perm in self.perms)
+
+    def has_perms(self, perm_list, obj=None):
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, app_label):
+        return self.is_superuser or any(perm.startswith(f'{app_label}.') for perm in self.perms)
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """
+    simplejwt's JWTAuthentication, reading request.user from the database, with the
+    tokens revoked by revoke_tokens() rejected.
+    """
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken(_('Token has been revoked'))
+        return validated_token
+
+
+class StatelessJWTAuthentication(JWTAuthentication, JWTStatelessUserAuthentication):
+    """
+    Authenticates from the token alone, without reading the user row: request.user is a
+    ClaimsTokenUser. Tokens revoked with revoke_tokens() are rejected.
+
+    The claims are only trusted while the 'permissions' version they were issued at is
+    current (see core.signals.handlers). After a change to any user's permissions, groups
+    or staff status, older tokens are authenticated from the database instead, with the
+    permissions cached by core.backends.CachedModelBackend, until they are refreshed.
+    """
+
+    def get_user(self, validated_token):
+        if validated_token.get('perms_version') != get_version('permissions'):
+            return BaseJWTAuthentication.get_user(self, validated_token)
+        return super().get_user(validated_token)
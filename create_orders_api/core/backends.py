@@ -0,0 +1,28 @@
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from store.caching import get_version
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    ModelBackend keeping the permissions of each user in the cache, so checking them
+    doesn't join the permission, group and user tables on every request.
+
+    The entries are keyed by a 'permissions' version that core.signals.handlers bumps
+    whenever a user's groups or permissions or a group's permissions change. The
+    version and the entries are kept in the default cache, which has to be shared by
+    every process for a change to reach all of them (check core.W001).
+    """
+    timeout = 60 * 60
+
+    def get_all_permissions(self, user_obj, obj=None):
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, '_perm_cache'):
+            key = f'core:perms:{user_obj.pk}:{int(user_obj.is_superuser)}:{get_version("permissions")}'
+            perms = cache.get(key)
+            if perms is None:
+                perms = super().get_all_permissions(user_obj)
+                cache.set(key, perms, self.timeout)
+            user_obj._perm_cache = perms
+        return user_obj._perm_cache
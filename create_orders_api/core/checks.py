@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+# backends whose entries are only seen by the process that wrote them.
+PROCESS_LOCAL_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The token revocations (core/authentication.py) and the cached permissions with their
+    version (core/backends.py) are only invalidated in every process if they share the cache.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is private to each process.',
+        hint='Revoked tokens stay valid and changed permissions stay cached (for up to an hour) '
+             'in the other processes. Use a shared backend, such as RedisCache, in CACHES.',
+        id='core.W001',
+    )]
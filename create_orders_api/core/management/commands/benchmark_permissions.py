@@ -0,0 +1,62 @@
+import statistics
+import time
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.models import Group, Permission
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core.backends import CachedModelBackend
+from core.models import User
+from store.caching import bump_version
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the permission checks a request of FullDjangoModelPermissions and '
+        'ViewCustomerHistoryPermission makes, for a user in --groups groups, with '
+        'ModelBackend and CachedModelBackend. The user and groups are created in a '
+        'transaction that is rolled back at the end.'
+    )
+    checked_perms = ['store.view_product', 'store.change_product', 'store.view_history']
+
+    def add_arguments(self, parser):
+        parser.add_argument('--groups', type=int, default=50,
+                            help='Number of groups the user belongs to (default: 50).')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Number of requests to simulate per backend (default: 200).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = self.create_user(options['groups'])
+            for backend in (ModelBackend(), CachedModelBackend()):
+                self.run(backend, user.pk, options['requests'])
+            transaction.set_rollback(True)
+        # the rolled back user id may be handed out again.
+        bump_version('permissions')
+
+    def create_user(self, group_count):
+        user = User.objects.create_user('benchmark-permissions', 'benchmark-permissions@example.com')
+        permissions = list(Permission.objects.all())
+        groups = [Group.objects.create(name=f'benchmark-permissions-{n}') for n in range(group_count)]
+        for n, group in enumerate(groups):
+            group.permissions.set(permissions[n % len(permissions)::group_count or 1])
+        user.groups.set(groups)
+        return user
+
+    def run(self, backend, user_id, requests):
+        timings = []
+        queries = []
+        for _ in range(requests):
+            # every request authenticates a fresh user object, without the permissions of the last one.
+            user = User.objects.get(pk=user_id)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                for perm in self.checked_perms:
+                    backend.has_perm(user, perm)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        self.stdout.write(
+            f'{type(backend).__name__}: mean {statistics.mean(timings):.3f}ms, '
+            f'median {statistics.median(timings):.3f}ms, '
+            f'{statistics.mean(queries):.1f} queries per request.')
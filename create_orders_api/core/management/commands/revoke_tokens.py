@@ -0,0 +1,24 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.authentication import revoke_tokens
+
+
+class Command(BaseCommand):
+    help = (
+        'Logs the given users out everywhere: every JWT issued to them until now is rejected '
+        'by every endpoint (see core.authentication).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='+')
+
+    def handle(self, *args, **options):
+        users = dict(get_user_model().objects
+                     .filter(username__in=options['usernames'])
+                     .values_list('username', 'id'))
+        missing = set(options['usernames']) - set(users)
+        if missing:
+            raise CommandError(f'No user named {", ".join(sorted(missing))}.')
+        for user_id in users.values():
+            revoke_tokens(user_id)
+        self.stdout.write(self.style.SUCCESS(f'Revoked the tokens of {len(users)} users.'))
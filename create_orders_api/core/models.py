@@ -3,4 +3,13 @@ from django.db import models
 
 # Create your models here.
 class User(AbstractUser):
-  email = models.EmailField(unique=True)
\ No newline at end of file
+  PERMISSION_FLAGS = ('is_active', 'is_staff', 'is_superuser')
+
+  email = models.EmailField(unique=True)
+
+  @classmethod
+  def from_db(cls, db, field_names, values):
+    user = super().from_db(db, field_names, values)
+    # remembered so a change of these invalidates the claims and permissions cached for the user.
+    user._loaded_flags = tuple(user.__dict__.get(name) for name in cls.PERMISSION_FLAGS)
+    return user
@@ -1,4 +1,15 @@
 from djoser.serializers import UserSerializer as BaseUserSerializer, UserCreateSerializer as BaseUserCreateSerializer
+from django.contrib.auth import get_user_model
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import (TokenObtainPairSerializer as BaseTokenObtainPairSerializer,
+                                                  TokenRefreshSerializer as BaseTokenRefreshSerializer)
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from core.authentication import is_revoked
+from store.caching import get_version
+from store.models import Customer
 
 
 class UserCreateSerializer(BaseUserCreateSerializer):
@@ -9,4 +20,42 @@ class UserCreateSerializer(BaseUserCreateSerializer):
 
 class UserSerializer(BaseUserSerializer):
     class Meta(BaseUserSerializer.Meta):
-        fields = ['id', 'username', 'email', 'first_name', 'last_name']
\ No newline at end of file
+        fields = ['id', 'username', 'email', 'first_name', 'last_name']
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        cls.add_claims(token, user)
+        return token
+
+    # the claims core.authentication.StatelessJWTAuthentication builds request.user from,
+    # set again on every refresh. "perms_version" tells that authentication when they are outdated.
+    @staticmethod
+    def add_claims(token, user):
+        # read before the permissions, so a change made meanwhile leaves the claims outdated.
+        token['perms_version'] = get_version('permissions')
+        token['is_staff'] = user.is_staff
+        token['is_superuser'] = user.is_superuser
+        token['customer_id'] = Customer.objects.filter(user_id=user.id).values_list('id', flat=True).first()
+        # a superuser has every permission anyway.
+        token['perms'] = [] if user.is_superuser else sorted(user.get_all_permissions())
+
+
+class TokenRefreshSerializer(BaseTokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        if is_revoked(refresh):
+            raise InvalidToken(_('Token has been revoked'))
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(api_settings.USER_ID_CLAIM)}).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        data = super().validate(attrs)
+        # the claims are read from the database again rather than copied from the refresh token.
+        access = AccessToken(data['access'])
+        TokenObtainPairSerializer.add_claims(access, user)
+        data['access'] = str(access)
+        return data
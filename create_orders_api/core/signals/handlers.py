@@ -1,5 +1,10 @@
+from store.caching import bump_version
 from store.signals import order_created
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+from core.models import User
 
 
 @receiver(order_created)
@@ -8,3 +13,31 @@ def on_order_created(sender, **kwargs):
     # keyword argument "order" is created when the signal is fired.
     # print the newly created order object.
     print(kwargs["order_object"])    # Order object (18)
+
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+@receiver(m2m_changed, sender=Group.permissions.through)
+def bump_permissions_version(sender, **kwargs):
+    # invalidates every user's permissions cached by core.backends.CachedModelBackend.
+    if kwargs["action"].startswith("post_"):
+        transaction.on_commit(lambda: bump_version("permissions"))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def bump_permissions_version_on_delete(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version("permissions"))
+
+
+@receiver(post_save, sender=User)
+def bump_permissions_version_on_flags(sender, **kwargs):
+    # also outdates the claims of the tokens issued before (see core.authentication).
+    user = kwargs["instance"]
+    flags = tuple(getattr(user, name) for name in User.PERMISSION_FLAGS)
+    loaded = getattr(user, "_loaded_flags", None)
+    user._loaded_flags = flags
+    if loaded is not None and loaded != flags:
+        transaction.on_commit(lambda: bump_version("permissions"))
@@ -1,3 +1,68 @@
+import time
+from unittest import mock
+from django.contrib.auth.models import Group, Permission
 from django.test import TestCase
+from rest_framework.test import APIClient
+from core.authentication import revoke_tokens
+from core.models import User
+from store.models import Customer
 
-# Create your tests here.
+
+class TokenClaimsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('clerk', 'clerk@example.com', 'password')
+        self.group = Group.objects.create(name='Clerks')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.add(Permission.objects.get(codename='view_history'))
+            self.user.groups.add(self.group)
+        self.customer = Customer.objects.get(user=self.user)
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post('/auth/jwt/create/', {'username': 'clerk', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {response.data["access"]}')
+        return response.data
+
+    def refresh(self, tokens):
+        response = self.client.post('/auth/jwt/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION=f'JWT {response.data["access"]}')
+
+    def get_history(self):
+        return self.client.get(f'/store/customers/{self.customer.id}/history/')
+
+    def test_a_removed_permission_is_denied_with_tokens_issued_before(self):
+        tokens = self.login()
+        self.assertEqual(self.get_history().status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.permissions.clear()
+        self.assertEqual(self.get_history().status_code, 403)
+        self.refresh(tokens)
+        self.assertEqual(self.get_history().status_code, 403)
+
+    def test_a_demoted_staff_user_loses_admin_access(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        self.login()
+        self.assertEqual(self.client.get('/store/customers/').status_code, 200)
+
+        user = User.objects.get(pk=self.user.pk)
+        user.is_staff = False
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save()
+        self.assertEqual(self.client.get('/store/customers/').status_code, 403)
+
+    def test_revoked_tokens_are_rejected_by_every_endpoint(self):
+        tokens = self.login()
+        response = self.client.get('/auth/users/me/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['email'], 'clerk@example.com')
+
+        # a second later, so the tokens issued above are older than the revocation.
+        with mock.patch('core.authentication.time.time', return_value=time.time() + 1):
+            revoke_tokens(self.user.id)
+        self.assertEqual(self.client.get('/auth/users/me/').status_code, 401)
+        self.assertEqual(self.get_history().status_code, 401)
+        self.assertEqual(self.client.post('/auth/jwt/refresh/', {'refresh': tokens['refresh']}).status_code, 401)
@@ -0,0 +1,8 @@
+from rest_framework.routers import DefaultRouter
+from . import views
+
+# djoser's user endpoints (djoser.urls), served by core.views.UserViewSet.
+router = DefaultRouter()
+router.register('users', views.UserViewSet)
+
+urlpatterns = router.urls
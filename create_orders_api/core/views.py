@@ -1,3 +1,8 @@
-from django.shortcuts import render
+from djoser.views import UserViewSet as BaseUserViewSet
+from core.authentication import JWTAuthentication
 
-# Create your views here.
+
+class UserViewSet(BaseUserViewSet):
+    # the account endpoints read and change the user row itself, so request.user is
+    # loaded from the database rather than built from the token claims.
+    authentication_classes = [JWTAuthentication]
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class LikesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'likes'
+
+    def ready(self) -> None:
+        import likes.checks
+        import likes.signals.handlers
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+from core.checks import PROCESS_LOCAL_CACHES
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Likes are recorded in the cache by the web processes and written to LikeCounter by
+    flush_like_counts, which runs in a process of its own.
+    """
+    backend = settings.CACHES.get('default', {}).get('BACKEND')
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [Warning(
+        f'The default cache ({backend}) is private to each process.',
+        hint='Likes recorded by the web processes never reach flush_like_counts and are lost. '
+             'Use a shared backend, such as RedisCache, in CACHES.',
+        id='likes.W001',
+    )]
@@ -0,0 +1,85 @@
+import time
+from contextlib import contextmanager
+from django.core.cache import cache
+from django.db import transaction
+from .models import LikeCounter
+
+
+DELTA_KEY = 'likes:delta:%s:%s'
+DIRTY_MARK_KEY = 'likes:dirty:%s:%s'
+DIRTY_KEY = 'likes:dirty'
+LOCK_KEY = 'likes:dirty:lock'
+LOCK_TIMEOUT = 5
+
+
+@contextmanager
+def _lock():
+    deadline = time.monotonic() + LOCK_TIMEOUT
+    while not cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            raise TimeoutError('Could not lock the dirty like counters')
+        time.sleep(0.005)
+    try:
+        yield
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _incr(key, delta):
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        if not cache.add(key, delta, timeout=None):
+            cache.incr(key, delta)
+
+
+def record_like(content_type_id, object_id, delta=1):
+    """
+    Adds `delta` to the pending likes of the object. Pending likes are coalesced in the
+    cache and only written to LikeCounter by flush(), one statement for all objects.
+
+    The object is added to the dirty set the first time it changes since the last
+    flush, so the shared set (and its lock) isn't touched on every like.
+
+    flush() usually runs in another process, so the default cache must be shared
+    (see CACHES in storefront/settings.py and check likes.W001).
+    """
+    _incr(DELTA_KEY % (content_type_id, object_id), delta)
+    if cache.add(DIRTY_MARK_KEY % (content_type_id, object_id), 1, timeout=None):
+        with _lock():
+            dirty = cache.get(DIRTY_KEY) or set()
+            dirty.add((content_type_id, object_id))
+            cache.set(DIRTY_KEY, dirty, timeout=None)
+
+
+def get_pending(content_type_id, object_id):
+    return cache.get(DELTA_KEY % (content_type_id, object_id), 0)
+
+
+def flush():
+    """
+    Writes the pending likes to LikeCounter and returns the number of counters updated.
+    """
+    with _lock():
+        dirty = cache.get(DIRTY_KEY) or set()
+        cache.delete(DIRTY_KEY)
+
+    deltas = {}
+    for content_type_id, object_id in dirty:
+        # the mark goes first: a like recorded from now on marks the object dirty again.
+        cache.delete(DIRTY_MARK_KEY % (content_type_id, object_id))
+        delta = get_pending(content_type_id, object_id)
+        if delta:
+            # taken out with incr rather than reset, so likes recorded meanwhile are kept.
+            cache.incr(DELTA_KEY % (content_type_id, object_id), -delta)
+            deltas[(content_type_id, object_id)] = delta
+
+    try:
+        with transaction.atomic():
+            LikeCounter.objects.add_counts(deltas)
+    except Exception:
+        # put the deltas back for the next flush.
+        for (content_type_id, object_id), delta in deltas.items():
+            record_like(content_type_id, object_id, delta)
+        raise
+    return len(deltas)
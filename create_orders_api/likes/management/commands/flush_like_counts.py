@@ -0,0 +1,23 @@
+import time
+from django.core.management.base import BaseCommand
+from likes.counters import flush
+
+
+class Command(BaseCommand):
+    help = (
+        'Writes the likes coalesced in the cache to the like counters, in one statement. '
+        'Exits after one flush unless --poll is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Keep running, flushing every POLL seconds.')
+
+    def handle(self, *args, **options):
+        while True:
+            updated = flush()
+            if updated:
+                self.stdout.write(f'Updated {updated} like counters.')
+            if options['poll'] is None:
+                break
+            time.sleep(options['poll'])
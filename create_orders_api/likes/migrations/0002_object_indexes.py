@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_likes(apps, schema_editor):
+    # keeps the first like of every (user, object) pair so the unique constraint can be added.
+    LikedItem = apps.get_model('likes', 'LikedItem')
+    duplicates = LikedItem.objects \
+        .values('user', 'content_type', 'object_id') \
+        .annotate(first_id=Min('id'), likes=Count('id')) \
+        .filter(likes__gt=1)
+    for duplicate in duplicates.iterator():
+        LikedItem.objects \
+            .filter(user=duplicate['user'], content_type=duplicate['content_type'], object_id=duplicate['object_id']) \
+            .exclude(id=duplicate['first_id']) \
+            .delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='likeditem',
+            index=models.Index(fields=['content_type', 'object_id'], name='likes_item_object_idx'),
+        ),
+        migrations.RunPython(delete_duplicate_likes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='likeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'content_type', 'object_id'), name='likes_item_unique_user_object'),
+        ),
+    ]
@@ -1,5 +1,5 @@
 from django.conf import settings
-from django.db import models
+from django.db import connections, models
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 
@@ -9,3 +9,66 @@ class LikedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        constraints = [
+            # a user likes an object once; also serves "did this user like these objects" lookups.
+            models.UniqueConstraint(fields=['user', 'content_type', 'object_id'], name='likes_item_unique_user_object'),
+        ]
+        indexes = [
+            # "likes of these objects" lookups.
+            models.Index(fields=['content_type', 'object_id'], name='likes_item_object_idx'),
+        ]
+
+
+class LikeCounterManager(models.Manager):
+    def get_counts_for_many(self, obj_type, obj_ids):
+        """
+        Returns {object id: like count} for the objects of `obj_type` with the given ids,
+        from a single query. Objects nobody liked are left out.
+
+        Counts lag behind LikedItem until flush_like_counts applies the latest likes.
+        """
+        content_type = ContentType.objects.get_for_model(obj_type)
+        return dict(self
+                    .filter(content_type=content_type, object_id__in=list(obj_ids))
+                    .values_list('object_id', 'count'))
+
+    def add_counts(self, deltas):
+        """
+        Adds each delta of {(content type id, object id): delta} to its counter,
+        creating the missing counters, with one INSERT ... ON CONFLICT.
+        """
+        if not deltas:
+            return
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        count = quote_name('count')
+
+        if connection.vendor == 'mysql':
+            on_conflict = f'ON DUPLICATE KEY UPDATE {count} = {table}.{count} + VALUES({count})'
+        else:
+            on_conflict = f'ON CONFLICT (content_type_id, object_id) DO UPDATE SET {count} = {table}.{count} + excluded.{count}'
+        values = ', '.join(['(%s, %s, %s)'] * len(deltas))
+        sql = f'INSERT INTO {table} (content_type_id, object_id, {count}) VALUES {values} {on_conflict}'
+        params = [param for (content_type_id, object_id), delta in deltas.items()
+                  for param in (content_type_id, object_id, delta)]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+class LikeCounter(models.Model):
+    """
+    The number of likes of an object, kept up to date by likes.counters instead of
+    counting LikedItem rows on every read.
+    """
+    objects = LikeCounterManager()
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id'], name='likes_counter_unique_object'),
+        ]
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from likes.counters import record_like
+from likes.models import LikedItem
+
+
+# counted once the like is committed, so a rolled back like is never counted.
+@receiver(post_save, sender=LikedItem)
+def count_like(sender, **kwargs):
+    if kwargs["created"]:
+        item = kwargs["instance"]
+        transaction.on_commit(lambda: record_like(item.content_type_id, item.object_id, 1))
+
+
+@receiver(post_delete, sender=LikedItem)
+def count_unlike(sender, **kwargs):
+    item = kwargs["instance"]
+    transaction.on_commit(lambda: record_like(item.content_type_id, item.object_id, -1))
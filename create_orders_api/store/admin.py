@@ -4,6 +4,8 @@ from django.db.models.query import QuerySet
 from django.utils.html import format_html, urlencode
 from django.urls import reverse
 from . import models
+from .caching import bump_table_version
+from .pagination import EstimatedCountPaginator
 
 
 class InventoryFilter(admin.SimpleListFilter):
@@ -33,7 +35,9 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ['collection', 'last_update', InventoryFilter]
     list_per_page = 10
     list_select_related = ['collection']
+    paginator = EstimatedCountPaginator
     search_fields = ['title']
+    show_full_result_count = False
 
     def collection_title(self, product):
         return product.collection.title
@@ -47,6 +51,8 @@ class ProductAdmin(admin.ModelAdmin):
     @admin.action(description='Clear inventory')
     def clear_inventory(self, request, queryset):
         updated_count = queryset.update(inventory=0)
+        # update() doesn't send post_save, so the cached product responses are invalidated here.
+        bump_table_version(models.Product)
         self.message_user(
             request,
             f'{updated_count} products were successfully updated.',
@@ -70,11 +76,6 @@ class CollectionAdmin(admin.ModelAdmin):
             }))
         return format_html('<a href="{}">{} Products</a>', url, collection.products_count)
 
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(
-            products_count=Count('products')
-        )
-
 
 @admin.register(models.Customer)
 class CustomerAdmin(admin.ModelAdmin):
@@ -83,7 +84,9 @@ class CustomerAdmin(admin.ModelAdmin):
     list_per_page = 10
     list_select_related = ['user']
     ordering = ['user__first_name', 'user__last_name']
+    paginator = EstimatedCountPaginator
     search_fields = ['first_name__istartswith', 'last_name__istartswith']
+    show_full_result_count = False
 
     @admin.display(ordering='orders_count')
     def orders(self, customer):
@@ -114,3 +117,5 @@ class OrderAdmin(admin.ModelAdmin):
     autocomplete_fields = ['customer']
     inlines = [OrderItemInline]
     list_display = ['id', 'placed_at', 'customer']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
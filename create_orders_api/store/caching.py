@@ -0,0 +1,94 @@
+import hashlib
+import time
+from django.core.cache import cache
+from django.utils.http import urlencode
+from rest_framework.response import Response
+
+
+VERSION_KEY = 'store:version:%s'
+RESPONSE_KEY = 'store:response:%s'
+STATS_KEY = 'store:response-cache:%s'
+
+
+def get_version(name):
+    # versions start from the current time (in ms) rather than 1, so a counter that
+    # was evicted from the cache never comes back with a value used before.
+    return cache.get_or_set(VERSION_KEY % name, lambda: int(time.time() * 1000), timeout=None)
+
+
+def bump_version(name):
+    try:
+        return cache.incr(VERSION_KEY % name)
+    except ValueError:
+        cache.set(VERSION_KEY % name, int(time.time() * 1000), timeout=None)
+
+
+def get_table_version(model):
+    return get_version(model._meta.db_table)
+
+
+def bump_table_version(model):
+    return bump_version(model._meta.db_table)
+
+
+def _count(outcome):
+    try:
+        cache.incr(STATS_KEY % outcome)
+    except ValueError:
+        if not cache.add(STATS_KEY % outcome, 1, timeout=None):
+            cache.incr(STATS_KEY % outcome)
+
+
+def get_cache_stats():
+    return {
+        'hits': cache.get(STATS_KEY % 'hits', 0),
+        'misses': cache.get(STATS_KEY % 'misses', 0),
+    }
+
+
+def reset_cache_stats():
+    cache.delete_many([STATS_KEY % 'hits', STATS_KEY % 'misses'])
+
+
+class CachedResponseMixin:
+    """
+    Caches the data of list and retrieve responses.
+
+    The cache key is made of the action, the url kwargs, the normalized query string
+    and the current version of every table in `cache_models`. Saving or deleting a row
+    of one of those tables bumps its version (see store.signals.handlers), so stale
+    entries are never read again and simply expire.
+    """
+    cache_models = []
+    cache_timeout = 60 * 15
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request):
+        query = urlencode(sorted(
+            (param, value)
+            for param, values in request.query_params.lists()
+            for value in values
+        ))
+        versions = ':'.join(str(get_table_version(model)) for model in self.cache_models)
+        kwargs = urlencode(sorted(self.kwargs.items()))
+        digest = hashlib.md5(f'{self.action}|{kwargs}|{query}'.encode()).hexdigest()
+        return RESPONSE_KEY % f'{self.basename}:{versions}:{digest}'
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            _count('hits')
+            return Response(data, headers={'X-Cache': 'HIT'})
+
+        _count('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, self.cache_timeout)
+        response['X-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,222 @@
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from uuid import UUID, uuid4
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from .models import Product
+
+
+def cart_store_enabled():
+    return getattr(settings, 'STORE_CART_BACKEND', 'database') == 'cache'
+
+
+class CachedCartItem:
+    def __init__(self, product, quantity):
+        self.product = product
+        self.quantity = quantity
+
+    # a product appears once per cart, so its id doubles as the item id in the API.
+    @property
+    def id(self):
+        return self.product.id
+
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def total_price(self):
+        return self.quantity * self.product.unit_price
+
+
+class CachedCart:
+    def __init__(self, id, created_at, items):
+        self.id = id
+        self.created_at = created_at
+        self.items = items
+
+    @property
+    def total_price(self):
+        return sum(item.total_price for item in self.items)
+
+
+class CartStore:
+    """
+    Keeps carts in the cache instead of the store_cart and store_cartitem tables.
+
+    A cart is an entry holding its creation time and the ids of its products, plus one
+    counter per product holding the quantity, so adding to a cart is an atomic cache.incr().
+    Adding a new product or removing one changes the cart entry and takes a short lock.
+    Every write pushes the expiry of the whole cart `timeout` seconds forward.
+    """
+    lock_timeout = 5
+    claim_timeout = 60
+
+    def __init__(self, alias='default', timeout=None):
+        self.cache = caches[alias]
+        self.timeout = timeout if timeout is not None else \
+            getattr(settings, 'STORE_CART_TIMEOUT', 60 * 60 * 24 * 7)
+
+    def _cart_key(self, cart_id):
+        return f'store:cart:{cart_id.hex}'
+
+    def _item_key(self, cart_id, product_id):
+        return f'store:cart:{cart_id.hex}:{product_id}'
+
+    def _claim_key(self, cart_id):
+        return f'store:cart:{cart_id.hex}:checkout'
+
+    def _parse_id(self, cart_id):
+        try:
+            return cart_id if isinstance(cart_id, UUID) else UUID(str(cart_id))
+        except ValueError:
+            return None
+
+    @contextmanager
+    def _lock(self, cart_id):
+        key = f'store:cart:{cart_id.hex}:lock'
+        deadline = time.monotonic() + self.lock_timeout
+        while not self.cache.add(key, 1, self.lock_timeout):
+            if time.monotonic() > deadline:
+                raise TimeoutError(f'Could not lock cart {cart_id}')
+            time.sleep(0.005)
+        try:
+            yield
+        finally:
+            self.cache.delete(key)
+
+    def _touch(self, cart_id, product_ids):
+        self.cache.touch(self._cart_key(cart_id), self.timeout)
+        for product_id in product_ids:
+            self.cache.touch(self._item_key(cart_id, product_id), self.timeout)
+
+    def create(self):
+        cart_id = uuid4()
+        created_at = timezone.now()
+        self.cache.set(self._cart_key(cart_id), {'created_at': created_at, 'product_ids': []}, self.timeout)
+        return CachedCart(cart_id, created_at, [])
+
+    def get_quantities(self, cart_id):
+        """
+        Returns {product id: quantity} in the order the products were added,
+        or None if there is no such cart.
+        """
+        cart_id = self._parse_id(cart_id)
+        cart = cart_id and self.cache.get(self._cart_key(cart_id))
+        if cart is None:
+            return None
+
+        keys = [self._item_key(cart_id, product_id) for product_id in cart['product_ids']]
+        quantities = self.cache.get_many(keys)
+        return {
+            product_id: quantities[key]
+            for product_id, key in zip(cart['product_ids'], keys) if quantities.get(key)
+        }
+
+    def get(self, cart_id):
+        cart_id = self._parse_id(cart_id)
+        cart = cart_id and self.cache.get(self._cart_key(cart_id))
+        if cart is None:
+            return None
+
+        quantities = self.get_quantities(cart_id) or {}
+        products = Product.objects.only('id', 'title', 'unit_price').in_bulk(list(quantities))
+        items = [
+            CachedCartItem(products[product_id], quantity)
+            for product_id, quantity in quantities.items() if product_id in products
+        ]
+        return CachedCart(cart_id, cart['created_at'], items)
+
+    def get_item(self, cart_id, product_id):
+        cart_id = self._parse_id(cart_id)
+        quantity = cart_id and self.cache.get(self._item_key(cart_id, product_id))
+        if not quantity:
+            return None
+        product = Product.objects.only('id', 'title', 'unit_price').filter(pk=product_id).first()
+        return product and CachedCartItem(product, quantity)
+
+    def delete(self, cart_id):
+        cart_id = self._parse_id(cart_id)
+        cart = cart_id and self.cache.get(self._cart_key(cart_id))
+        if cart is None:
+            return False
+        self.cache.delete_many(
+            [self._cart_key(cart_id), self._claim_key(cart_id)] +
+            [self._item_key(cart_id, product_id) for product_id in cart['product_ids']])
+        return True
+
+    def claim(self, cart_id):
+        """
+        Reserves the cart for one checkout and returns True, or False if another checkout
+        holds it. The claim ends when the cart is deleted, with release(), or after
+        `claim_timeout` seconds if the checkout never finishes.
+        """
+        cart_id = self._parse_id(cart_id)
+        return cart_id is not None and self.cache.add(self._claim_key(cart_id), 1, self.claim_timeout)
+
+    def release(self, cart_id):
+        cart_id = self._parse_id(cart_id)
+        if cart_id is not None:
+            self.cache.delete(self._claim_key(cart_id))
+
+    def add_item(self, cart_id, product_id, quantity):
+        """
+        Adds `quantity` to the product's line and returns the new quantity,
+        or None if there is no such cart.
+        """
+        cart_id = self._parse_id(cart_id)
+        if cart_id is None:
+            return None
+
+        item_key = self._item_key(cart_id, product_id)
+        try:
+            quantity = self.cache.incr(item_key, quantity)
+            cart = self.cache.get(self._cart_key(cart_id))
+            if cart is None:
+                return None
+        except ValueError:
+            # first time this product is added: register it on the cart, then create its counter.
+            with self._lock(cart_id):
+                cart = self.cache.get(self._cart_key(cart_id))
+                if cart is None:
+                    return None
+                if product_id not in cart['product_ids']:
+                    cart['product_ids'].append(product_id)
+                    self.cache.set(self._cart_key(cart_id), cart, self.timeout)
+                if not self.cache.add(item_key, quantity, self.timeout):
+                    quantity = self.cache.incr(item_key, quantity)
+
+        self._touch(cart_id, cart['product_ids'])
+        return quantity
+
+    def set_quantity(self, cart_id, product_id, quantity):
+        cart_id = self._parse_id(cart_id)
+        cart = cart_id and self.cache.get(self._cart_key(cart_id))
+        if cart is None or product_id not in cart['product_ids']:
+            return False
+        self.cache.set(self._item_key(cart_id, product_id), quantity, self.timeout)
+        self._touch(cart_id, cart['product_ids'])
+        return True
+
+    def remove_item(self, cart_id, product_id):
+        cart_id = self._parse_id(cart_id)
+        if cart_id is None:
+            return False
+
+        with self._lock(cart_id):
+            cart = self.cache.get(self._cart_key(cart_id))
+            if cart is None or product_id not in cart['product_ids']:
+                return False
+            cart['product_ids'].remove(product_id)
+            self.cache.set(self._cart_key(cart_id), cart, self.timeout)
+            self.cache.delete(self._item_key(cart_id, product_id))
+
+        self._touch(cart_id, cart['product_ids'])
+        return True
+
+
+@lru_cache(maxsize=None)
+def get_cart_store():
+    return CartStore()
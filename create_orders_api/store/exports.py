@@ -0,0 +1,49 @@
+import csv
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+
+
+class Echo:
+    """A file-like object whose write() returns the line, for csv.writer to stream through."""
+    def write(self, value):
+        return value
+
+
+def iterate_rows(queryset, fields, batch_size=2000):
+    """
+    Yields the `fields` of every row as a tuple, in primary key order.
+
+    Rows are read in batches seeking past the last primary key, each batch through
+    iterator(), so neither the database driver nor Django holds more than a batch
+    in memory however many rows are exported.
+    """
+    last_pk = None
+    while True:
+        batch = queryset.order_by('pk')
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        count = 0
+        for row in batch.values_list('pk', *fields)[:batch_size].iterator(chunk_size=batch_size):
+            last_pk = row[0]
+            count += 1
+            yield row[1:]
+        if count < batch_size:
+            return
+
+
+def render_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def render_ndjson(rows, fields):
+    for row in rows:
+        yield json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+RENDERERS = {
+    'csv': (render_csv, 'text/csv'),
+    'ndjson': (render_ndjson, 'application/x-ndjson'),
+}
@@ -1,10 +1,41 @@
-from django_filters.rest_framework import FilterSet
-from .models import Product
+from django_filters.rest_framework import CharFilter, FilterSet
+from rest_framework.filters import SearchFilter
+from tags.index import filter_by_tags
+from .models import Order, Product
+from .search import get_search_index
 
 class ProductFilter(FilterSet):
+  # "?tag=red,sale" keeps the products with both tags, "?tag_any=red,blue" those with either.
+  tag = CharFilter(method='filter_tags', label='Tags (all of, comma separated)')
+  tag_any = CharFilter(method='filter_tags', label='Tags (any of, comma separated)')
+
   class Meta:
     model = Product
     fields = {
       'collection_id': ['exact'],
       'unit_price': ['gt', 'lt']
-    }
\ No newline at end of file
+    }
+
+  def filter_tags(self, queryset, name, value):
+    return filter_by_tags(queryset, value.split(','), match_all=(name == 'tag'))
+
+
+class OrderExportFilter(FilterSet):
+  class Meta:
+    model = Order
+    fields = {
+      'placed_at': ['gte', 'lt'],
+      'payment_status': ['exact'],
+    }
+
+
+class FullTextSearchFilter(SearchFilter):
+  """
+  Answers "?search=" from the configured search index (settings.STORE_SEARCH_INDEX)
+  instead of LIKE scans, and orders the results by relevance.
+  """
+  def filter_queryset(self, request, queryset, view):
+    query = request.query_params.get(self.search_param, '')
+    if not query.strip():
+      return queryset
+    return get_search_index().filter(queryset, query)
@@ -0,0 +1,79 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+
+HEADER = 'Idempotency-Key'
+
+
+def _sha256(*parts):
+    return hashlib.sha256(b'\0'.join(
+        part if isinstance(part, bytes) else str(part).encode() for part in parts)).hexdigest()
+
+
+def _claim(key, fingerprint):
+    """
+    Inserts the key and returns (record, True), or returns (record, False) with the record of
+    an earlier request. A duplicate of a request that is still running waits on the unique
+    index until that request's transaction ends.
+    """
+    expires_at = timezone.now() + timedelta(seconds=getattr(settings, 'STORE_IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+    while True:
+        try:
+            with transaction.atomic():
+                return IdempotencyKey.objects.create(key=key, fingerprint=fingerprint, expires_at=expires_at), True
+        except IntegrityError:
+            record = IdempotencyKey.objects.select_for_update().filter(key=key).first()
+            if record is not None and record.expires_at > timezone.now():
+                return record, False
+            # the key expired, or another retry deleted the expired record meanwhile: claim it again.
+            if record is not None:
+                record.delete()
+
+
+def idempotent(view_method):
+    """
+    Makes a create view honor the Idempotency-Key header.
+
+    The first request with a key runs the view and stores its response alongside the key,
+    in the same transaction, so a retry gets that response back (with an
+    Idempotent-Replayed header) without running the view again. Responses of failed
+    requests aren't stored: their transaction rolls back with the key and they can be retried.
+    Keys are scoped by user and path, and reusing one with a different body is rejected.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        client_key = request.headers.get(HEADER)
+        if not client_key:
+            return view_method(self, request, *args, **kwargs)
+
+        key = _sha256(request.user.pk, request.path, client_key)
+        fingerprint = _sha256(request.method, request.path, request.body)
+        with transaction.atomic():
+            record, created = _claim(key, fingerprint)
+            if not created:
+                if record.fingerprint != fingerprint:
+                    return Response(
+                        {'error': f'This {HEADER} was already used with a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                return Response(record.response_body, status=record.response_status,
+                                headers={'Idempotent-Replayed': 'true'})
+
+            response = view_method(self, request, *args, **kwargs)
+            if status.is_success(response.status_code):
+                # stored as rendered, so a replay serializes decimals and dates the same way.
+                record.response_status = response.status_code
+                record.response_body = json.loads(JSONRenderer().render(response.data) or 'null')
+                record.save(update_fields=['response_status', 'response_body'])
+            else:
+                transaction.set_rollback(True)
+            return response
+    return wrapper
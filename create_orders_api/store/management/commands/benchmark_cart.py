@@ -0,0 +1,76 @@
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from store.carts import cart_store_enabled, get_cart_store
+from store.models import Cart, CartItem, Collection, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Times GET /store/carts/<id>/ for carts of each --sizes number of items and reports '
+        'the latency and the number of queries per request. Carts and missing products are '
+        'created in a transaction that is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 100, 500],
+                            help='Cart sizes to benchmark (default: 1 10 100 500).')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Number of requests timed per cart (default: 50).')
+
+    def handle(self, *args, **options):
+        client = Client(SERVER_NAME='localhost')
+        with transaction.atomic():
+            products = self.get_products(max(options['sizes']))
+            for size in options['sizes']:
+                cart_id = self.create_cart(products[:size])
+                try:
+                    self.run(client, f'/store/carts/{cart_id}/', size, options['requests'])
+                finally:
+                    if cart_store_enabled():
+                        get_cart_store().delete(cart_id)
+            transaction.set_rollback(True)
+
+    def get_products(self, count):
+        missing = count - Product.objects.count()
+        if missing > 0:
+            collection = Collection.objects.first() or Collection.objects.create(title='benchmark')
+            # bulk_create skips Product.save() and the signals: nothing outside the transaction changes.
+            Product.objects.bulk_create([
+                Product(title=f'benchmark {n}', slug=f'benchmark-{n}', description='',
+                        unit_price=Decimal('10.00'), inventory=10, collection=collection)
+                for n in range(missing)
+            ])
+        return list(Product.objects.order_by('id').values_list('id', flat=True)[:count])
+
+    def create_cart(self, product_ids):
+        if cart_store_enabled():
+            store = get_cart_store()
+            cart = store.create()
+            for product_id in product_ids:
+                store.add_item(cart.id, product_id, 1)
+            return cart.id
+        cart = Cart.objects.create()
+        CartItem.objects.bulk_create([CartItem(cart=cart, product_id=product_id, quantity=1) for product_id in product_ids])
+        return cart.id
+
+    def run(self, client, path, size, requests):
+        timings = []
+        queries = []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+        assert response.status_code == 200, response.status_code
+
+        timings.sort()
+        self.stdout.write(
+            f'{size} items: median {statistics.median(timings):.2f}ms, '
+            f'p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:.2f}ms, '
+            f'{statistics.mean(queries):.1f} queries per request.')
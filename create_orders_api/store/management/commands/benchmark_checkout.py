@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework.exceptions import ValidationError
+from store.models import Cart, CartItem, Collection, Customer, Order, OrderItem, OutboxEvent, Product
+from store.serializers import CreateOrderSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        'Checks out --checkouts one-item carts of the same product from --threads threads at once, '
+        'with only --inventory in stock, and reports the throughput. Fails if the product was '
+        'oversold. The threads need committed rows, so the product, carts and orders are '
+        'created for real and deleted at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=200,
+                            help='Number of carts checked out (default: 200).')
+        parser.add_argument('--threads', type=int, default=20,
+                            help='Number of concurrent checkouts (default: 20).')
+        parser.add_argument('--inventory', type=int, default=100,
+                            help='Stock of the product; the other checkouts run out of it (default: 100).')
+        parser.add_argument('--customer', type=int, default=None,
+                            help='Id of the customer checking out (default: the first one).')
+
+    def handle(self, *args, **options):
+        customer = Customer.objects.filter(pk=options['customer']).first() if options['customer'] \
+            else Customer.objects.order_by('pk').first()
+        if customer is None:
+            raise CommandError('No customer to check out as.')
+
+        # created and deleted with the signals, so the collection's products_count stays right.
+        collection = Collection.objects.first() or Collection.objects.create(title='benchmark')
+        product = Product.objects.create(
+            title='benchmark checkout', slug='benchmark-checkout', description='',
+            unit_price=Decimal('10.00'), inventory=options['inventory'], collection=collection)
+        carts = Cart.objects.bulk_create([Cart() for _ in range(options['checkouts'])])
+        CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for cart in carts])
+
+        try:
+            ordered, out_of_stock, elapsed = self.run(customer, [cart.id for cart in carts], options['threads'])
+            product.refresh_from_db()
+            self.stdout.write(
+                f'{options["checkouts"]} checkouts from {options["threads"]} threads in {elapsed:.2f}s '
+                f'({options["checkouts"] / elapsed:.0f}/s): {ordered} ordered, {out_of_stock} out of stock, '
+                f'{product.inventory} left.')
+            if product.inventory < 0 or ordered + product.inventory != options['inventory']:
+                raise CommandError(f'Oversold: {ordered} ordered out of {options["inventory"]} in stock.')
+        finally:
+            order_ids = list(OrderItem.objects.filter(product=product).values_list('order_id', flat=True))
+            OutboxEvent.objects.filter(
+                event=OutboxEvent.EVENT_ORDER_CREATED, payload__order_id__in=order_ids).delete()
+            OrderItem.objects.filter(order_id__in=order_ids).delete()
+            Order.objects.filter(pk__in=order_ids).delete()
+            Cart.objects.filter(pk__in=[cart.id for cart in carts]).delete()
+            product.delete()
+
+    def run(self, customer, cart_ids, threads):
+        pending = queue.Queue()
+        for cart_id in cart_ids:
+            pending.put(cart_id)
+        results = {'ordered': 0, 'out_of_stock': 0}
+        errors = []
+        lock = threading.Lock()
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        cart_id = pending.get_nowait()
+                    except queue.Empty:
+                        return
+                    serializer = CreateOrderSerializer(data={'cart_id': cart_id}, context={'user_id': customer.user_id})
+                    serializer.is_valid(raise_exception=True)
+                    try:
+                        serializer.save()
+                        outcome = 'ordered'
+                    except ValidationError:
+                        outcome = 'out_of_stock'
+                    with lock:
+                        results[outcome] += 1
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if errors:
+            raise CommandError(f'{len(errors)} checkouts failed: {errors[0]!r}')
+        return results['ordered'], results['out_of_stock'], elapsed
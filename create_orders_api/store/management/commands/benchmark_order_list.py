@@ -0,0 +1,50 @@
+import statistics
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+class Command(BaseCommand):
+    help = (
+        'Requests GET /store/orders/ --requests times as the given user, authenticated '
+        'with a JWT like a real client, and reports the latency and the number of queries '
+        'per request. Run it against a database holding a realistic amount of orders.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='User the orders are listed for.')
+        parser.add_argument('--requests', type=int, default=100,
+                            help='Number of requests to time (default: 100).')
+        parser.add_argument('--path', default='/store/orders/',
+                            help='Path requested (default: /store/orders/).')
+
+    def handle(self, *args, **options):
+        user = get_user_model().objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(f'No user named {options["username"]!r}.')
+
+        client = Client(SERVER_NAME='localhost', HTTP_AUTHORIZATION=f'JWT {AccessToken.for_user(user)}')
+        # the first request warms up the url resolver, the serializers and the caches.
+        response = client.get(options['path'])
+        if response.status_code != 200:
+            raise CommandError(f'GET {options["path"]} answered {response.status_code}.')
+
+        timings = []
+        queries = []
+        for _ in range(options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                client.get(options['path'])
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(len(captured))
+
+        timings.sort()
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        self.stdout.write(self.style.SUCCESS(
+            f'GET {options["path"]} x{len(timings)}: '
+            f'mean {statistics.mean(timings):.2f}ms, median {statistics.median(timings):.2f}ms, '
+            f'p95 {p95:.2f}ms, {statistics.mean(queries):.1f} queries per request.'))
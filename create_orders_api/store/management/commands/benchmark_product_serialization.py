@@ -0,0 +1,75 @@
+import statistics
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+from store.models import Collection, Product
+from store.pricing import annotate_price_with_tax
+from store.serializers import ProductSerializer
+
+
+class PerRowTaxProductSerializer(serializers.ModelSerializer):
+    """ProductSerializer as it was before price_with_tax was annotated by the queryset."""
+    class Meta:
+        model = Product
+        fields = ['id', 'title', 'description', 'slug', 'inventory',
+                  'unit_price', 'price_with_tax', 'collection']
+
+    price_with_tax = serializers.SerializerMethodField(method_name='calculate_tax')
+
+    def calculate_tax(self, product: Product):
+        return product.unit_price * Decimal(1.1)
+
+
+class AnnotatedTaxProductSerializer(ProductSerializer):
+    """ProductSerializer without the tags, so both serializers output the same fields."""
+    class Meta(ProductSerializer.Meta):
+        fields = [field for field in ProductSerializer.Meta.fields if field != 'tags']
+
+
+class Command(BaseCommand):
+    help = (
+        'Times serializing and rendering --rows products with the per-row price_with_tax '
+        'method and with the price annotated by the queryset, reporting the best of --runs. '
+        'Missing products are created in a transaction that is rolled back at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000,
+                            help='Number of products serialized per run (default: 10000).')
+        parser.add_argument('--runs', type=int, default=10,
+                            help='Number of timed runs per serializer (default: 10).')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        with transaction.atomic():
+            self.create_products(rows)
+            plain = list(Product.objects.order_by('id')[:rows])
+            annotated = list(annotate_price_with_tax(Product.objects.order_by('id'))[:rows])
+            self.run('per-row method', PerRowTaxProductSerializer, plain, options['runs'])
+            self.run('annotated', AnnotatedTaxProductSerializer, annotated, options['runs'])
+            transaction.set_rollback(True)
+
+    def create_products(self, rows):
+        missing = rows - Product.objects.count()
+        if missing <= 0:
+            return
+        collection = Collection.objects.first() or Collection.objects.create(title='benchmark')
+        # bulk_create skips Product.save() and the signals: nothing outside the transaction changes.
+        Product.objects.bulk_create([
+            Product(title=f'benchmark {n}', slug=f'benchmark-{n}', description='',
+                    unit_price=Decimal(10 + n % 90), inventory=10, collection=collection)
+            for n in range(missing)
+        ], batch_size=1000)
+
+    def run(self, name, serializer_class, products, runs):
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            JSONRenderer().render(serializer_class(products, many=True).data)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{name}: {len(products)} products in {min(timings):.1f}ms '
+            f'(best of {runs}, median {statistics.median(timings):.1f}ms).')
@@ -0,0 +1,70 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from store.filters import ProductFilter
+from store.models import Collection, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs EXPLAIN on the queries generated by ProductFilter and the product ordering '
+        'and fails if any of them scans the whole store_product table. '
+        'Run it against a database holding a realistic amount of data, '
+        'planners happily scan tables that only have a few rows.'
+    )
+
+    def get_query_shapes(self):
+        collection_id = Collection.objects.values_list('id', flat=True).first() or 1
+        return [
+            ('collection', {'collection_id': collection_id}, 'title'),
+            ('collection and price range',
+             {'collection_id': collection_id, 'unit_price__gt': 10, 'unit_price__lt': 20}, 'title'),
+            ('price range', {'unit_price__gt': 10, 'unit_price__lt': 20}, 'unit_price'),
+            ('ordered by title', {}, 'title'),
+            ('ordered by unit_price', {}, 'unit_price'),
+            ('ordered by -unit_price', {}, '-unit_price'),
+            ('ordered by last_update', {}, 'last_update'),
+            ('ordered by -last_update', {}, '-last_update'),
+        ]
+
+    def build_queryset(self, params, ordering):
+        queryset = ProductFilter(params, queryset=Product.objects.all()).qs
+        # same shape as a page of the products endpoint: ordering, tie-breaker and a limit.
+        tie_breaker = '-id' if ordering.startswith('-') else 'id'
+        return queryset.order_by(ordering, tie_breaker)[:10]
+
+    def is_full_scan(self, plan):
+        table = Product._meta.db_table
+        if connection.vendor == 'mysql':
+            return self._mysql_full_scan(json.loads(plan), table)
+        if connection.vendor == 'postgresql':
+            return f'Seq Scan on {table}' in plan
+        # sqlite: "SCAN store_product" reads the table, "SCAN store_product USING INDEX ..." walks an index.
+        return any(
+            line.strip().endswith(f'SCAN {table}')
+            for line in plan.splitlines()
+        )
+
+    def _mysql_full_scan(self, node, table):
+        if isinstance(node, dict):
+            if node.get('table_name') == table and node.get('access_type') == 'ALL':
+                return True
+            return any(self._mysql_full_scan(value, table) for value in node.values())
+        if isinstance(node, list):
+            return any(self._mysql_full_scan(value, table) for value in node)
+        return False
+
+    def handle(self, *args, **options):
+        explain_options = {'format': 'json'} if connection.vendor == 'mysql' else {}
+        full_scans = []
+        for name, params, ordering in self.get_query_shapes():
+            plan = self.build_queryset(params, ordering).explain(**explain_options)
+            if self.is_full_scan(plan):
+                full_scans.append(name)
+                self.stdout.write(self.style.ERROR(f'FULL SCAN  {name}'))
+                self.stdout.write(plan)
+            else:
+                self.stdout.write(self.style.SUCCESS(f'OK         {name}'))
+
+        if full_scans:
+            raise CommandError(f'{len(full_scans)} product queries scan the whole table: {", ".join(full_scans)}')
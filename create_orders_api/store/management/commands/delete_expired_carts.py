@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.models import Cart
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the carts (and their items) created more than --days days ago. '
+        'Carts are deleted in batches of --batch-size, each in its own short transaction, '
+        'so the command can run while the cart endpoints serve traffic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30,
+                            help='Delete carts older than this many days (default: 30).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of carts deleted per transaction (default: 1000).')
+        parser.add_argument('--sleep', type=float, default=0,
+                            help='Seconds to pause between batches, to leave room for other writes.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        batch_size = options['batch_size']
+        deleted_carts = deleted_items = 0
+        started = time.monotonic()
+
+        while True:
+            cart_ids = list(
+                Cart.objects
+                .filter(created_at__lt=cutoff)
+                .values_list('id', flat=True)[:batch_size])
+            if not cart_ids:
+                break
+
+            # the collector deletes the items of the batch with one DELETE ... WHERE cart_id IN (...).
+            batch_started = time.monotonic()
+            _, deleted = Cart.objects.filter(id__in=cart_ids, created_at__lt=cutoff).delete()
+            deleted_carts += deleted.get('store.Cart', 0)
+            deleted_items += deleted.get('store.CartItem', 0)
+            self.stdout.write(
+                f'Deleted {deleted.get("store.Cart", 0)} carts and {deleted.get("store.CartItem", 0)} items '
+                f'in {time.monotonic() - batch_started:.2f}s')
+
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        elapsed = time.monotonic() - started
+        rate = deleted_carts / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted_carts} carts and {deleted_items} cart items in {elapsed:.2f}s '
+            f'({rate:.0f} carts/s).'))
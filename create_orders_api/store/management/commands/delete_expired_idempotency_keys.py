@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the Idempotency-Key records past their expiry, '
+        'in batches of --batch-size, each in its own short transaction.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of keys deleted per transaction (default: 1000).')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        deleted_keys = 0
+        while True:
+            ids = list(
+                IdempotencyKey.objects
+                .filter(expires_at__lte=now)
+                .values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted, _ = IdempotencyKey.objects.filter(id__in=ids, expires_at__lte=now).delete()
+            deleted_keys += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted_keys} expired idempotency keys.'))
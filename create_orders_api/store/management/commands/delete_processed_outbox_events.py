@@ -0,0 +1,34 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from store.models import OutboxEvent
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes the outbox events delivered more than --days days ago, '
+        'in batches of --batch-size, each in its own short transaction. '
+        'Events that are pending or gave up after too many attempts are kept.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7,
+                            help='Delete events delivered more than this many days ago (default: 7).')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of events deleted per transaction (default: 1000).')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted_events = 0
+        while True:
+            # served by the (processed_at, available_at) index.
+            ids = list(
+                OutboxEvent.objects
+                .filter(processed_at__lt=cutoff)
+                .values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            deleted, _ = OutboxEvent.objects.filter(id__in=ids).delete()
+            deleted_events += deleted
+
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted_events} processed outbox events.'))
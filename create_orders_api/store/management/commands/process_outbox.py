@@ -0,0 +1,39 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from store.outbox import process_batch
+
+
+class Command(BaseCommand):
+    help = (
+        'Delivers the pending outbox events (e.g. order_created) to their signal receivers, '
+        'in batches, retrying the ones whose receivers fail. Exits once the outbox is drained, '
+        'unless --poll is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Give up on an event after this many failed deliveries (default: 5).')
+        parser.add_argument('--retry-delay', type=int, default=30,
+                            help='Seconds before the first retry, doubled on every attempt (default: 30).')
+        parser.add_argument('--poll', type=float, default=None,
+                            help='Keep running, checking for new events every POLL seconds once drained.')
+
+    def handle(self, *args, **options):
+        while True:
+            delivered, failed = process_batch(
+                batch_size=options['batch_size'],
+                max_attempts=options['max_attempts'],
+                retry_delay=options['retry_delay'])
+            if delivered or failed:
+                self.stdout.write(f'Delivered {delivered} events, {failed} failed.')
+            # a full batch means there may be more waiting.
+            if delivered + failed == options['batch_size']:
+                continue
+            if options['poll'] is None:
+                break
+            time.sleep(options['poll'])
+            # like the request cycle does, so a long running worker reconnects after the
+            # database closed its connection, and honors CONN_MAX_AGE.
+            close_old_connections()
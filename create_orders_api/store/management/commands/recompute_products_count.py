@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from store.models import Collection, Product
+
+
+class Command(BaseCommand):
+    help = (
+        'Recomputes Collection.products_count from the product table in a single UPDATE. '
+        'Run it after bulk changes that bypass Product.save(), like queryset.update(collection=...).'
+    )
+
+    def handle(self, *args, **options):
+        counts = Product.objects \
+            .filter(collection=OuterRef('pk')) \
+            .order_by() \
+            .values('collection') \
+            .annotate(count=Count('id')) \
+            .values('count')
+        updated = Collection.objects.update(products_count=Coalesce(Subquery(counts), Value(0)))
+        self.stdout.write(self.style.SUCCESS(f'Recomputed products_count of {updated} collections.'))
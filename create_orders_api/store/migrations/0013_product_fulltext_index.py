@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+# FULLTEXT indexes are MySQL specific, other databases search with store.search.InMemorySearchIndex.
+def create_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'CREATE FULLTEXT INDEX store_product_title_description_ft '
+            'ON store_product (title, description)')
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute(
+            'DROP INDEX store_product_title_description_ft ON store_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_alter_customer_options'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
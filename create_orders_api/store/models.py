@@ -1,7 +1,10 @@
 from django.contrib import admin
 from django.conf import settings
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import connections, models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from uuid import uuid4
 
 
@@ -14,10 +17,20 @@ class Collection(models.Model):
     title = models.CharField(max_length=255)
     featured_product = models.ForeignKey(
         'Product', on_delete=models.SET_NULL, null=True, related_name='+', blank=True)
+    # maintained by Product.save() and the product post_delete handler.
+    # "python manage.py recompute_products_count" repairs it after bulk changes.
+    products_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self) -> str:
         return self.title
 
+    @classmethod
+    def adjust_products_count(cls, collection_id, delta):
+        # clamped at 0: once bulk_create or fixtures made the counter drift, a decrement
+        # would otherwise break the column's unsigned/CHECK constraint and fail the delete.
+        cls.objects.filter(pk=collection_id).update(
+            products_count=Greatest(F('products_count') + delta, 0, output_field=models.IntegerField()))
+
     class Meta:
         ordering = ['title']
 
@@ -39,8 +52,35 @@ class Product(models.Model):
     def __str__(self) -> str:
         return self.title
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        product = super().from_db(db, field_names, values)
+        # remembered so save() can tell when the product moves to another collection.
+        product._loaded_collection_id = product.__dict__.get('collection_id')
+        return product
+
+    def save(self, *args, **kwargs):
+        adding = self._state.adding
+        previous_collection_id = getattr(self, '_loaded_collection_id', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                Collection.adjust_products_count(self.collection_id, 1)
+            elif previous_collection_id is not None and previous_collection_id != self.collection_id:
+                Collection.adjust_products_count(previous_collection_id, -1)
+                Collection.adjust_products_count(self.collection_id, 1)
+        self._loaded_collection_id = self.collection_id
+
     class Meta:
         ordering = ['title']
+        # match the access paths of ProductFilter and the OrderingFilter/keyset pagination
+        # of ProductViewSet; "id" is the keyset tie-breaker.
+        indexes = [
+            models.Index(fields=['collection', 'unit_price'], name='store_product_coll_price_idx'),
+            models.Index(fields=['unit_price', 'id'], name='store_product_price_id_idx'),
+            models.Index(fields=['last_update', 'id'], name='store_product_update_id_idx'),
+            models.Index(fields=['title', 'id'], name='store_product_title_id_idx'),
+        ]
 
 
 class Customer(models.Model):
@@ -116,10 +156,51 @@ class Address(models.Model):
 
 class Cart(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid4)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # indexed for "python manage.py delete_expired_carts".
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+
+class CartItemManager(models.Manager):
+    def add_quantity(self, cart_id, product_id, quantity):
+        """
+        Adds `quantity` of the product to the cart, creating the cart item if needed.
+
+        It is a single INSERT ... SELECT that only inserts if the product exists and adds
+        to the existing row on a (cart, product) conflict, so concurrent adds can't race.
+        Returns the cart item, or None if there is no product with the given id.
+        """
+        connection = connections[self.db]
+        quote_name = connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        cart_id = self.model._meta.get_field('cart').get_db_prep_value(cart_id, connection)
+
+        if connection.vendor == 'mysql':
+            on_conflict = f'ON DUPLICATE KEY UPDATE {table}.quantity = {table}.quantity + %s'
+        else:
+            on_conflict = f'ON CONFLICT (cart_id, product_id) DO UPDATE SET quantity = {table}.quantity + %s'
+        sql = (
+            f'INSERT INTO {table} (cart_id, product_id, quantity) '
+            f'SELECT %s, id, %s FROM {quote_name(Product._meta.db_table)} WHERE id = %s '
+            f'{on_conflict}'
+        )
+        returning = connection.features.can_return_columns_from_insert
+        if returning:
+            sql += ' RETURNING id, quantity'
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [cart_id, quantity, product_id, quantity])
+            if returning:
+                row = cursor.fetchone()
+                if row is None:
+                    return None
+                return self.model(id=row[0], cart_id=cart_id, product_id=product_id, quantity=row[1])
+            if cursor.rowcount == 0:
+                return None
+        return self.get(cart_id=cart_id, product_id=product_id)
 
 
 class CartItem(models.Model):
+    objects = CartItemManager()
     cart = models.ForeignKey(
         Cart, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -137,3 +218,40 @@ class Review(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField()
     date = models.DateField(auto_now_add=True)
+
+
+class OutboxEvent(models.Model):
+    """
+    An event written in the same transaction as the change it describes, and delivered
+    to its signal receivers after commit by "python manage.py process_outbox". Delivered
+    events are removed by "python manage.py delete_processed_outbox_events".
+    """
+    EVENT_ORDER_CREATED = 'order_created'
+
+    event = models.CharField(max_length=255)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    available_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'available_at'], name='store_outbox_pending_idx'),
+        ]
+
+
+class IdempotencyKey(models.Model):
+    """
+    The response of a POST sent with an Idempotency-Key header, replayed when the client
+    retries the request with the same key (see store.idempotency).
+    """
+    # sha256 of the user, the path and the key sent by the client.
+    key = models.CharField(max_length=64, unique=True)
+    # sha256 of the request method, path and body.
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
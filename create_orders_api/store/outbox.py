@@ -0,0 +1,98 @@
+import traceback
+from datetime import timedelta
+from django.db import DatabaseError, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Order, OutboxEvent
+from .signals import order_created
+
+
+def publish(event, **payload):
+    """
+    Records an event in the current transaction. It is only delivered once that
+    transaction commits, by process_outbox, away from the request.
+    """
+    return OutboxEvent.objects.create(event=event, payload=payload)
+
+
+def _send_order_created(events):
+    orders = Order.objects \
+        .select_related('customer') \
+        .in_bulk([event.payload['order_id'] for event in events])
+    for event in events:
+        order = orders.get(event.payload['order_id'])
+        yield event, lambda order=order: order_created.send_robust(Order, order_object=order)
+
+
+def _send_unknown(events):
+    def send():
+        raise LookupError(f'Unknown outbox event {events[0].event!r}')
+    for event in events:
+        yield event, send
+
+
+# event name -> function yielding (event, function sending its signal) for a batch of those events.
+SENDERS = {
+    OutboxEvent.EVENT_ORDER_CREATED: _send_order_created,
+}
+
+
+def process_batch(batch_size=100, max_attempts=5, retry_delay=30):
+    """
+    Delivers up to `batch_size` pending events and returns (delivered, failed).
+
+    An event whose receivers raised is retried later, with an exponential backoff starting
+    at `retry_delay` seconds, until it has been attempted `max_attempts` times. Receivers
+    of a retried event run again, so they must tolerate seeing an event more than once.
+    """
+    now = timezone.now()
+    events = []
+    try:
+        with transaction.atomic():
+            events = _lock_pending(now, batch_size, max_attempts)
+            delivered, failed = _deliver(events, now, retry_delay)
+    except DatabaseError:
+        # the transaction was lost as a whole (mysql rolls it back on a deadlock), with the
+        # outcome of every event: the batch counts as a failed attempt, so max_attempts applies.
+        OutboxEvent.objects \
+            .filter(pk__in=[event.pk for event in events], processed_at__isnull=True) \
+            .update(attempts=F('attempts') + 1, available_at=now + timedelta(seconds=retry_delay))
+        raise
+    return delivered, failed
+
+
+def _lock_pending(now, batch_size, max_attempts):
+    # concurrent workers skip the rows another worker has locked, where the database allows it.
+    return list(
+        OutboxEvent.objects
+        .select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        .filter(processed_at__isnull=True, available_at__lte=now, attempts__lt=max_attempts)
+        .order_by('id')[:batch_size])
+
+
+def _deliver(events, now, retry_delay):
+    delivered = failed = 0
+    by_event = {}
+    for event in events:
+        by_event.setdefault(event.event, []).append(event)
+
+    for name, batch in by_event.items():
+        for event, send in SENDERS.get(name, _send_unknown)(batch):
+            event.attempts += 1
+            try:
+                # a savepoint per event: receivers that fail, or break the transaction
+                # (a database error, a deadlock), only roll back the writes of their event.
+                with transaction.atomic():
+                    errors = [response for _, response in send() if isinstance(response, Exception)]
+                    if errors:
+                        raise errors[0]
+            except Exception as error:
+                event.last_error = ''.join(traceback.format_exception(type(error), error, error.__traceback__))
+                event.available_at = now + timedelta(seconds=retry_delay * 2 ** (event.attempts - 1))
+                failed += 1
+            else:
+                event.processed_at = now
+                delivered += 1
+
+    OutboxEvent.objects.bulk_update(events, ['attempts', 'last_error', 'available_at', 'processed_at'])
+    return delivered, failed
@@ -1,4 +1,234 @@
-from rest_framework.pagination import PageNumberPagination
+import hashlib
+from base64 import b64decode, b64encode
+from collections import namedtuple
+from urllib import parse
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.core.paginator import EmptyPage, Page, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def estimate_row_count(model, using='default'):
+  """
+  Returns the row count the database keeps in its statistics for the model's table,
+  or None when the backend doesn't expose one.
+  """
+  connection = connections[using]
+  table = model._meta.db_table
+  with connection.cursor() as cursor:
+    if connection.vendor == 'mysql':
+      cursor.execute(
+        'SELECT TABLE_ROWS FROM information_schema.TABLES '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table])
+    elif connection.vendor == 'postgresql':
+      cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+    else:
+      return None
+    row = cursor.fetchone()
+
+  # postgres reports -1 for tables that were never analyzed.
+  if row is None or row[0] is None or row[0] < 0:
+    return None
+  return int(row[0])
+
+
+class EstimatedCountPage(Page):
+  next_exists = False
+
+  def has_next(self):
+    return self.next_exists
+
+
+class EstimatedCountPaginator(Paginator):
+  """
+  A paginator that avoids COUNT(*) over big tables.
+
+  An unfiltered queryset is counted from the table statistics once the table holds
+  at least `estimate_threshold` rows (below that the estimate is too rough and an
+  exact count is cheap). Every other count is exact and cached for
+  `count_cache_timeout` seconds (0 disables the cache), keyed by the SQL of the queryset.
+  `count_estimated` tells which one was used.
+
+  Since the count may be behind the table, it isn't used to validate page numbers or
+  to tell whether there is a next page: a page reads one extra row for that, and only
+  an empty page past the first one is rejected.
+  """
+  estimate_threshold = 100000
+  count_cache_timeout = 30
+  count_estimated = False
+
+  def validate_number(self, number):
+    # like Paginator.validate_number, without the upper bound taken from the count.
+    try:
+      if isinstance(number, float) and not number.is_integer():
+        raise ValueError
+      number = int(number)
+    except (TypeError, ValueError):
+      raise PageNotAnInteger(self.error_messages['invalid_page'])
+    if number < 1:
+      raise EmptyPage(self.error_messages['min_page'])
+    return number
+
+  def page(self, number):
+    number = self.validate_number(number)
+    bottom = (number - 1) * self.per_page
+    object_list = list(self.object_list[bottom:bottom + self.per_page + 1])
+    if not object_list and number > 1:
+      raise EmptyPage(self.error_messages['no_results'])
+    page = EstimatedCountPage(object_list[:self.per_page], number, self)
+    page.next_exists = len(object_list) > self.per_page
+    return page
+
+  @cached_property
+  def count(self):
+    queryset = self.object_list
+    if not isinstance(queryset, QuerySet):
+      return super().count
+
+    if not queryset.query.has_filters():
+      estimate = estimate_row_count(queryset.model, using=queryset.db)
+      if estimate is not None and estimate >= self.estimate_threshold:
+        self.count_estimated = True
+        return estimate
+
+    if not self.count_cache_timeout:
+      return queryset.count()
+    try:
+      sql = str(queryset.query)
+    except EmptyResultSet:
+      return 0
+    key = 'store:count:%s' % hashlib.md5(f'{queryset.db}|{sql}'.encode()).hexdigest()
+    return cache.get_or_set(key, queryset.count, self.count_cache_timeout)
+
 
 class DefaultPagination(PageNumberPagination):
-  page_size = 10
\ No newline at end of file
+  page_size = 10
+  django_paginator_class = EstimatedCountPaginator
+
+  def get_paginated_response(self, data):
+    return Response({
+      'count': self.page.paginator.count,
+      'count_estimated': self.page.paginator.count_estimated,
+      'next': self.get_next_link(),
+      'previous': self.get_previous_link(),
+      'results': data,
+    })
+
+  def get_paginated_response_schema(self, schema):
+    response_schema = super().get_paginated_response_schema(schema)
+    response_schema['properties']['count_estimated'] = {'type': 'boolean', 'example': False}
+    return response_schema
+
+
+class ExactCountPaginator(EstimatedCountPaginator):
+  """
+  EstimatedCountPaginator without the count cache: a filtered count is exact and
+  current, for lists that must show a write right away (a customer's orders).
+  """
+  count_cache_timeout = 0
+
+
+class ExactCountPagination(DefaultPagination):
+  django_paginator_class = ExactCountPaginator
+
+
+Cursor = namedtuple('Cursor', ['position', 'pk', 'reverse'])
+
+
+class KeysetPagination(CursorPagination):
+  """
+  Paginates by seeking past the (ordering field, id) pair of the last row
+  instead of using OFFSET, so every page costs the same and no COUNT(*) is issued.
+
+  The ordering comes from the view's OrderingFilter (only its first field is used)
+  and falls back to `ordering`. `id` breaks ties between rows with the same value.
+  """
+  page_size = 10
+  ordering = 'title'
+  tie_breaker = 'id'
+
+  def paginate_queryset(self, queryset, request, view=None):
+    self.request = request
+    self.base_url = request.build_absolute_uri()
+    self.page_size = self.get_page_size(request)
+    if not self.page_size:
+      return None
+
+    field = self.get_ordering(request, queryset, view)[0]
+    self.field_name = field.lstrip('-')
+    self.cursor = self.decode_cursor(request)
+    reverse = self.cursor is not None and self.cursor.reverse
+
+    # walking backwards to the previous page flips the direction of the ordering.
+    descending = field.startswith('-') != reverse
+    prefix = '-' if descending else ''
+    queryset = queryset.order_by(prefix + self.field_name, prefix + self.tie_breaker)
+
+    if self.cursor is not None:
+      lookup = 'lt' if descending else 'gt'
+      try:
+        queryset = queryset.filter(
+          Q(**{f'{self.field_name}__{lookup}': self.cursor.position}) |
+          Q(**{self.field_name: self.cursor.position, f'{self.tie_breaker}__{lookup}': self.cursor.pk})
+        )
+      except (TypeError, ValueError, ValidationError):
+        raise NotFound(self.invalid_cursor_message)
+
+    results = list(queryset[:self.page_size + 1])
+    has_more = len(results) > self.page_size
+    self.page = results[:self.page_size]
+
+    if reverse:
+      self.page.reverse()
+      self.has_next = True
+      self.has_previous = has_more
+    else:
+      self.has_next = has_more
+      self.has_previous = self.cursor is not None
+
+    return self.page
+
+  def get_next_link(self):
+    if not self.has_next or not self.page:
+      return None
+    return self.encode_cursor(self._get_cursor(self.page[-1], reverse=False))
+
+  def get_previous_link(self):
+    if not self.has_previous or not self.page:
+      return None
+    return self.encode_cursor(self._get_cursor(self.page[0], reverse=True))
+
+  def _get_cursor(self, instance, reverse):
+    position = getattr(instance, self.field_name)
+    if hasattr(position, 'isoformat'):
+      position = position.isoformat()
+    return Cursor(position=str(position), pk=getattr(instance, self.tie_breaker), reverse=reverse)
+
+  def decode_cursor(self, request):
+    encoded = request.query_params.get(self.cursor_query_param)
+    if not encoded:
+      return None
+
+    try:
+      querystring = b64decode(encoded.encode('ascii')).decode('utf-8')
+      tokens = parse.parse_qs(querystring, keep_blank_values=True)
+      return Cursor(
+        position=tokens['p'][0],
+        pk=int(tokens['i'][0]),
+        reverse=bool(int(tokens.get('r', ['0'])[0])))
+    except (TypeError, ValueError, KeyError, UnicodeDecodeError):
+      raise NotFound(self.invalid_cursor_message)
+
+  def encode_cursor(self, cursor):
+    tokens = {'p': cursor.position, 'i': cursor.pk}
+    if cursor.reverse:
+      tokens['r'] = '1'
+    querystring = parse.urlencode(tokens)
+    encoded = b64encode(querystring.encode('utf-8')).decode('ascii')
+    return replace_query_param(self.base_url, self.cursor_query_param, encoded)
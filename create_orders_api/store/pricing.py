@@ -0,0 +1,42 @@
+from decimal import Decimal
+from functools import lru_cache
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db.models import DecimalField, ExpressionWrapper, F, Value
+from django.dispatch import receiver
+
+
+DEFAULT_TAX_RATE = '0.10'
+
+
+@lru_cache(maxsize=None)
+def _get_configured_rate(region):
+    rates = getattr(settings, 'STORE_TAX_RATES', {})
+    return Decimal(str(rates.get(region, DEFAULT_TAX_RATE)))
+
+
+def get_tax_rate(region=None):
+    # STORE_TAX_RATES maps a region code to its rate; unknown regions pay the 'default' rate.
+    # the region comes from the query string, so only configured ones reach the memoized
+    # lookup and the cache can't grow with whatever clients send.
+    if region not in getattr(settings, 'STORE_TAX_RATES', {}):
+        region = 'default'
+    return _get_configured_rate(region)
+
+
+@receiver(setting_changed)
+def clear_tax_rate_cache(setting, **kwargs):
+    if setting == 'STORE_TAX_RATES':
+        _get_configured_rate.cache_clear()
+
+
+def price_with_tax(unit_price, region=None):
+    return unit_price * (1 + get_tax_rate(region))
+
+
+def annotate_price_with_tax(queryset, region=None):
+    # the database multiplies unit_price by an exact decimal, so serializing a page
+    # no longer calls a python method per product.
+    return queryset.annotate(price_with_tax=ExpressionWrapper(
+        F('unit_price') * Value(1 + get_tax_rate(region)),
+        output_field=DecimalField(max_digits=8, decimal_places=2)))
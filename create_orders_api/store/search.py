@@ -0,0 +1,167 @@
+import re
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+from .models import Product
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+class InMemorySearchIndex:
+    """
+    An inverted index over Product.title and Product.description kept in memory.
+
+    It is built from the database on first use and kept up to date by the Product
+    save/delete signals. Every process holds its own copy, so it suits tests and
+    single-process deployments; use MySQLFullTextIndex when several workers serve the API.
+    """
+    title_weight = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings = None   # term -> {product id: score}
+        self._terms = []        # sorted terms, for prefix lookups
+        self._documents = {}    # product id -> its terms
+
+    def _load(self):
+        with self._lock:
+            if self._postings is not None:
+                return
+            self._postings = {}
+            for product_id, title, description in \
+                    Product.objects.values_list('id', 'title', 'description').iterator():
+                self._add(product_id, title, description)
+
+    def _add(self, product_id, title, description):
+        scores = defaultdict(int)
+        for term in tokenize(title):
+            scores[term] += self.title_weight
+        for term in tokenize(description):
+            scores[term] += 1
+
+        for term, score in scores.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                insort(self._terms, term)
+            self._postings[term][product_id] = score
+        self._documents[product_id] = list(scores)
+
+    def _remove(self, product_id):
+        for term in self._documents.pop(product_id, []):
+            postings = self._postings[term]
+            del postings[product_id]
+            if not postings:
+                del self._postings[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _prefix_postings(self, prefix):
+        matches = {}
+        # walked by position: slicing from the match would copy the rest of the terms.
+        position = bisect_left(self._terms, prefix)
+        while position < len(self._terms) and self._terms[position].startswith(prefix):
+            for product_id, score in self._postings[self._terms[position]].items():
+                matches[product_id] = max(score, matches.get(product_id, 0))
+            position += 1
+        return matches
+
+    def update(self, product):
+        with self._lock:
+            # an index that isn't loaded yet will read the new row when it is.
+            if self._postings is None:
+                return
+            self._remove(product.pk)
+            self._add(product.pk, product.title, product.description)
+
+    def remove(self, product_id):
+        with self._lock:
+            if self._postings is not None:
+                self._remove(product_id)
+
+    def search(self, query):
+        """
+        Returns {product id: score} for the products containing every term of the query.
+        The last term matches as a prefix, since it is usually still being typed.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return {}
+
+        self._load()
+        with self._lock:
+            scores = None
+            for position, term in enumerate(terms):
+                if position == len(terms) - 1:
+                    postings = self._prefix_postings(term)
+                else:
+                    postings = self._postings.get(term, {})
+                if scores is None:
+                    scores = dict(postings)
+                else:
+                    scores = {
+                        product_id: score + postings[product_id]
+                        for product_id, score in scores.items() if product_id in postings
+                    }
+                if not scores:
+                    return {}
+        return scores
+
+    def filter(self, queryset, query):
+        scores = self.search(query)
+        if not scores:
+            return queryset.none()
+        # scores are small integers, so the rank is one WHEN per distinct score rather than
+        # per product, and every match stays reachable through the pagination.
+        by_score = defaultdict(list)
+        for product_id, score in scores.items():
+            by_score[score].append(product_id)
+        rank = Case(
+            *[When(pk__in=product_ids, then=Value(score)) for score, product_ids in by_score.items()],
+            output_field=IntegerField())
+        return queryset.filter(pk__in=list(scores)).annotate(search_rank=rank).order_by('-search_rank', 'pk')
+
+
+class MySQLFullTextIndex:
+    """
+    Searches the FULLTEXT index on (title, description) created by migration 0013.
+    MySQL maintains that index itself, so there is nothing to do on save or delete.
+    """
+
+    def update(self, product):
+        pass
+
+    def remove(self, product_id):
+        pass
+
+    def filter(self, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset
+
+        # every term is required and the last one matches as a prefix, like InMemorySearchIndex.
+        expression = ' '.join('+' + term for term in terms) + '*'
+        table = connection.ops.quote_name(Product._meta.db_table)
+        match = f'MATCH ({table}.title, {table}.description) AGAINST (%s IN BOOLEAN MODE)'
+        return queryset \
+            .annotate(search_rank=RawSQL(match, [expression])) \
+            .filter(search_rank__gt=0) \
+            .order_by('-search_rank')
+
+
+@lru_cache(maxsize=None)
+def _get_index(path):
+    return import_string(path)()
+
+
+def get_search_index():
+    return _get_index(getattr(settings, 'STORE_SEARCH_INDEX', 'store.search.InMemorySearchIndex'))
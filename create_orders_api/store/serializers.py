@@ -1,8 +1,13 @@
-from django.db import transaction
-from decimal import Decimal
-from store.models import Cart, CartItem, Customer, Order, Product, Collection, Review, OrderItem
+from contextlib import contextmanager
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, When
+from store.models import Cart, CartItem, Customer, Order, OutboxEvent, Product, Collection, Review, OrderItem
 from rest_framework import serializers
-from store.signals import order_created
+from store.caching import bump_table_version
+from store.carts import cart_store_enabled, get_cart_store
+from store.pricing import price_with_tax
+from store.outbox import publish
+from tags.models import prefetch_tags
 
 
 class CollectionSerializer(serializers.ModelSerializer):
@@ -17,13 +22,21 @@ class ProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = Product
         fields = ['id', 'title', 'description', 'slug', 'inventory',
-                  'unit_price', 'price_with_tax', 'collection']
+                  'unit_price', 'price_with_tax', 'collection', 'tags']
 
-    price_with_tax = serializers.SerializerMethodField(
-        method_name='calculate_tax')
+    # annotated by the view's queryset (see store.pricing.annotate_price_with_tax).
+    price_with_tax = serializers.DecimalField(
+        max_digits=8, decimal_places=2, read_only=True)
+    # set on a whole page at once by the view (see tags.models.prefetch_tags).
+    tags = serializers.SlugRelatedField(slug_field='label', many=True, read_only=True)
 
-    def calculate_tax(self, product: Product):
-        return product.unit_price * Decimal(1.1)
+    def to_representation(self, product: Product):
+        # a product that was just created or updated wasn't loaded through the annotated queryset.
+        if not hasattr(product, 'price_with_tax'):
+            product.price_with_tax = price_with_tax(product.unit_price)
+        if not hasattr(product, 'tags'):
+            prefetch_tags([product])
+        return super().to_representation(product)
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -44,10 +57,8 @@ class SimpleProductSerializer(serializers.ModelSerializer):
 
 class CartItemSerializer(serializers.ModelSerializer):
     product = SimpleProductSerializer()
-    total_price = serializers.SerializerMethodField()
-
-    def get_total_price(self, cart_item: CartItem):
-        return cart_item.quantity * cart_item.product.unit_price
+    # annotated by the views' querysets.
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2, read_only=True)
 
     class Meta:
         model = CartItem
@@ -57,10 +68,8 @@ class CartItemSerializer(serializers.ModelSerializer):
 class CartSerializer(serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     items = CartItemSerializer(many=True, read_only=True)
-    total_price = serializers.SerializerMethodField()
-
-    def get_total_price(self, cart):
-        return sum([item.quantity * item.product.unit_price for item in cart.items.all()])
+    # annotated by CartViewSet.queryset; a cart that was just created is empty.
+    total_price = serializers.DecimalField(max_digits=15, decimal_places=2, read_only=True, default=0)
 
     class Meta:
         model = Cart
@@ -70,24 +79,15 @@ class CartSerializer(serializers.ModelSerializer):
 class AddCartItemSerializer(serializers.ModelSerializer):
     product_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        if not Product.objects.filter(pk=value).exists():
-            raise serializers.ValidationError('No product with the given ID was found.')
-        return value
-
+    # validating the product and adding to the cart line happen in one statement (see CartItemManager.add_quantity).
     def save(self, **kwargs):
         cart_id = self.context['cart_id']
         product_id = self.validated_data['product_id']
         quantity = self.validated_data['quantity']
 
-        try: 
-            cart_item = CartItem.objects.get(cart_id=cart_id, product_id=product_id)
-            cart_item.quantity += quantity
-            cart_item.save()
-            self.instance = cart_item
-        except CartItem.DoesNotExist:
-            self.instance = CartItem.objects.create(cart_id=cart_id, **self.validated_data)
-        
+        self.instance = CartItem.objects.add_quantity(cart_id, product_id, quantity)
+        if self.instance is None:
+            raise serializers.ValidationError({'product_id': ['No product with the given ID was found.']})
         return self.instance
 
     class Meta:
@@ -127,41 +127,137 @@ class OrderSerializer(serializers.ModelSerializer):
         fields = ["id", "placed_at", "payment_status", "customer", "items"]
 
 
+class CreatedOrderSerializer(OrderSerializer):
+    # the response of a checkout: the items are the ones CreateOrderSerializer built,
+    # given in the context rather than read back from the database.
+    items = serializers.SerializerMethodField()
+
+    def get_items(self, order):
+        return OrderItemSerializer(self.context["items"], many=True).data
+
+
 class CreateOrderSerializer(serializers.Serializer):
+    """
+    Checks out a cart with a fixed number of queries, whatever the number of items:
+    the cart lines (read in validate_cart_id, then read again and locked in save), the
+    locked products, the inventory update, the customer, the order, the order items (plus
+    reading their ids back on backends without RETURNING), the cart deletion and the
+    outbox event. The order's customer and items (in `order_items`) are kept, so the
+    response is serialized by CreatedOrderSerializer without a query.
+
+    Two checkouts of the same cart are serialized by the lock: the second one finds the
+    cart gone and fails, so the cart is ordered, and the inventory taken, only once.
+    """
     cart_id = serializers.UUIDField()
 
+    # returns {product id: quantity}, or None if there is no such cart.
+    # carts kept in the cache are only turned into rows (order items) here, at checkout.
+    def get_cart_quantities(self, cart_id):
+        if cart_store_enabled():
+            return get_cart_store().get_quantities(cart_id)
+        quantities = dict(CartItem.objects.filter(cart_id=cart_id).values_list("product_id", "quantity"))
+        # only an empty result needs a second query, to tell an empty cart from a missing one.
+        if not quantities and not Cart.objects.filter(pk=cart_id).exists():
+            return None
+        return quantities
+
     def validate_cart_id(self, cart_id):
-        if not Cart.objects.filter(pk=cart_id).exists():
+        quantities = self.get_cart_quantities(cart_id)
+        if quantities is None:
             raise serializers.ValidationError("No cart with the given id was found")
-        if CartItem.objects.filter(cart_id=cart_id).count() == 0:
+        if not quantities:
             raise serializers.ValidationError("The cart is empty")
         return cart_id
 
+    # returns the cart lines, locked until the end of the checkout. a cart that was checked out
+    # since validate_cart_id() is gone by the time the lock is granted.
+    @contextmanager
+    def lock_cart(self, cart_id):
+        if cart_store_enabled():
+            store = get_cart_store()
+            if not store.claim(cart_id):
+                raise serializers.ValidationError("No cart with the given id was found")
+            try:
+                quantities = store.get_quantities(cart_id)
+                if not quantities:
+                    raise serializers.ValidationError("No cart with the given id was found")
+                yield quantities
+            except Exception:
+                # the cart is kept when the checkout fails, so it can be checked out again.
+                store.release(cart_id)
+                raise
+        else:
+            quantities = dict(
+                CartItem.objects.select_for_update().filter(cart_id=cart_id).values_list("product_id", "quantity"))
+            if not quantities:
+                raise serializers.ValidationError("No cart with the given id was found")
+            yield quantities
+
+    def delete_cart(self, cart_id):
+        if cart_store_enabled():
+            # the cache isn't transactional, so the cart is only dropped once the order is committed.
+            transaction.on_commit(lambda: get_cart_store().delete(cart_id))
+            return
+        _, deleted = Cart.objects.filter(pk=cart_id).delete()
+        if not deleted.get(Cart._meta.label):
+            # rolls the order back: the cart was checked out by another request meanwhile.
+            raise serializers.ValidationError("No cart with the given id was found")
+
+    # locks the rows of the products in the cart and checks there is enough stock for every line.
+    def reserve_inventory(self, quantities):
+        # the rows are locked in id order, so concurrent checkouts sharing products can't deadlock.
+        products = list(Product.objects.select_for_update().filter(pk__in=quantities).order_by("pk"))
+
+        errors = [
+            f'Only {product.inventory} of "{product.title}" (product {product.id}) left in stock.'
+            for product in products if product.inventory < quantities[product.id]
+        ]
+        missing = set(quantities) - {product.id for product in products}
+        errors += [f"Product {product_id} is no longer available." for product_id in sorted(missing)]
+        if errors:
+            raise serializers.ValidationError({"items": errors})
+
+        # one UPDATE decrements the inventory of every product in the cart.
+        Product.objects.filter(pk__in=quantities).update(inventory=Case(
+            *[When(pk=product_id, then=F("inventory") - quantity) for product_id, quantity in quantities.items()],
+            output_field=IntegerField()))
+        # update() doesn't send post_save, so the cached product responses are invalidated here.
+        transaction.on_commit(lambda: bump_table_version(Product))
+        return products
+
     # save method will create an object based on the "validated_data".
     # we need to customize the save method.
     def save(self, **kwargs):
-        with transaction.atomic():
+        cart_id = self.validated_data["cart_id"]
+        with transaction.atomic(), self.lock_cart(cart_id) as quantities:
+            products = self.reserve_inventory(quantities)
+
             customer = Customer.objects.get(user_id=self.context["user_id"])
             order = Order.objects.create(customer=customer)
 
-            cart_items = CartItem.objects.select_related("product").filter(cart_id=self.validated_data["cart_id"])
-
-            # using each cartitem, we are creating the orderitems. Later we will delete the cart.
+            # using each cart line, we are creating the orderitems. Later we will delete the cart.
             orderitems_list = []
-            for item in cart_items:
-                orderitem = OrderItem(order=order, product=item.product, quantity=item.quantity, unit_price=item.product.unit_price)
+            for product in products:
+                orderitem = OrderItem(order=order, product=product, quantity=quantities[product.id], unit_price=product.unit_price)
                 orderitems_list.append(orderitem)
 
             # after creating the orderitem objects, we should save it to the database. Save the objects in bulk.
             OrderItem.objects.bulk_create(orderitems_list)
+            # mysql doesn't return the ids of bulk inserted rows; they are read back in one query.
+            if not connection.features.can_return_rows_from_bulk_insert:
+                ids = OrderItem.objects.filter(order=order).order_by("pk").values_list("pk", flat=True)
+                for orderitem, pk in zip(orderitems_list, ids):
+                    orderitem.pk = pk
 
+            # kept for the response (see CreatedOrderSerializer), so the items aren't read back.
+            self.order_items = orderitems_list
 
             # we delete the cart after taking all the order items from the cart.
-            Cart.objects.filter(pk=self.validated_data["cart_id"]).delete()
+            self.delete_cart(cart_id)
 
-            # "order_created" is the signal object. It sends/fires the signals to other receivers.
-            # additional data is sent as the keyword argument. We are sending "order_object" as the keyword argument in the signal.
-            order_created.send_robust(self.__class__, order_object=order)
+            # the "order_created" signal is sent by "python manage.py process_outbox" once this transaction
+            # commits, so its receivers don't add to the checkout time and never see an order that was rolled back.
+            publish(OutboxEvent.EVENT_ORDER_CREATED, order_id=order.id)
 
             # finally return order object.
             return order
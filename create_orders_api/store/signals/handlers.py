@@ -2,9 +2,13 @@
 # it is to make sure that when the user object is created, new customer also gets created.
 
 from django.conf import settings
-from ..models import Customer
+from django.db import transaction
+from ..caching import bump_table_version
+from ..models import Collection, Customer, Product, Promotion
+from ..search import get_search_index
+from tags.models import Tag, TaggedItem
 from django.dispatch import receiver
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 
 # below "signal handler" function creates a new "customer" object when the new "user" object is created.
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
@@ -14,3 +18,39 @@ def create_customer_for_new_user(sender, **kwargs):
     # In **kwargs, we have a key called "instance" which gives the "created instance/object" as its value.
     if kwargs["created"]:
         Customer.objects.create(user=kwargs["instance"])
+
+
+# cached catalog responses are keyed on the version of the tables they read.
+# the version is bumped after commit, so no request can cache the old rows again under the new version.
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Collection)
+@receiver([post_save, post_delete], sender=Promotion)
+@receiver([post_save, post_delete], sender=Tag)
+@receiver([post_save, post_delete], sender=TaggedItem)
+def bump_catalog_version(sender, **kwargs):
+    transaction.on_commit(lambda: bump_table_version(sender))
+
+
+@receiver(m2m_changed, sender=Product.promotions.through)
+def bump_product_version_on_promotions_change(sender, **kwargs):
+    if kwargs["action"].startswith("post_"):
+        transaction.on_commit(lambda: bump_table_version(Product))
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, **kwargs):
+    product = kwargs["instance"]
+    transaction.on_commit(lambda: get_search_index().update(product))
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, **kwargs):
+    product_id = kwargs["instance"].pk
+    transaction.on_commit(lambda: get_search_index().remove(product_id))
+
+
+# deletes go through the collector, which sends post_delete inside its own transaction,
+# so this also covers queryset deletes (e.g. the admin "delete selected" action).
+@receiver(post_delete, sender=Product)
+def decrement_products_count(sender, **kwargs):
+    Collection.adjust_products_count(kwargs["instance"].collection_id, -1)
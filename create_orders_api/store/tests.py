@@ -1,3 +1,542 @@
-from django.test import TestCase
+import csv
+import json
+import threading
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from decimal import Decimal
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import include, path
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from rest_framework_nested import routers
+from core.models import User
+from store.models import Cart, CartItem, Collection, Customer, IdempotencyKey, Order, OrderItem, Product
+from store.carts import get_cart_store
+from store.search import _get_index
+from store.serializers import AddCartItemSerializer, CreateOrderSerializer
+from tags.models import Tag, TaggedItem
+from store.views import CachedCartItemViewSet, CachedCartViewSet, OrderViewSet
 
-# Create your tests here.
+
+# store.urls picks the cart views when it is imported, so the cache-backed ones are
+# mounted here for the tests that use ROOT_URLCONF=__name__.
+cached_carts_router = routers.DefaultRouter()
+cached_carts_router.register('carts', CachedCartViewSet, basename='cart')
+cached_cart_items_router = routers.NestedDefaultRouter(cached_carts_router, 'carts', lookup='cart')
+cached_cart_items_router.register('items', CachedCartItemViewSet, basename='cart-items')
+urlpatterns = [
+    path('store/', include(cached_carts_router.urls + cached_cart_items_router.urls)),
+]
+
+
+def run_in_threads(target, count):
+    """Runs target() in `count` threads started together, each with its own connection."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def run():
+        try:
+            barrier.wait()
+            target()
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=run) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return errors
+
+
+def create_cart(products, quantity=1):
+    cart = Cart.objects.create()
+    CartItem.objects.bulk_create(CartItem(cart=cart, product=product, quantity=quantity) for product in products)
+    return cart
+
+
+def create_products(count, inventory=100):
+    collection = Collection.objects.create(title='Test')
+    return [
+        Product.objects.create(title=f'Product {n}', slug=f'product-{n}', description='',
+                               unit_price=Decimal('10.00'), inventory=inventory, collection=collection)
+        for n in range(count)
+    ]
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentAddToCartTests(TransactionTestCase):
+    def test_parallel_adds_of_the_same_product_add_up(self):
+        product, = create_products(1)
+        cart = Cart.objects.create()
+
+        def add():
+            serializer = AddCartItemSerializer(
+                data={'product_id': product.id, 'quantity': 2}, context={'cart_id': cart.id})
+            serializer.is_valid(raise_exception=True)
+            serializer.save()
+
+        errors = run_in_threads(add, 10)
+
+        self.assertEqual(errors, [])
+        item = CartItem.objects.get(cart=cart)
+        self.assertEqual(item.product_id, product.id)
+        self.assertEqual(item.quantity, 20)
+
+
+@skipUnlessDBFeature('has_select_for_update', 'test_db_allows_multiple_connections')
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        stock = 10
+        checkouts = 40
+        product, = create_products(1, inventory=stock)
+        user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        carts = []
+        for _ in range(checkouts):
+            cart = Cart.objects.create()
+            CartItem.objects.create(cart=cart, product=product, quantity=1)
+            carts.append(cart.id)
+
+        out_of_stock = []
+
+        def checkout():
+            serializer = CreateOrderSerializer(data={'cart_id': carts.pop()}, context={'user_id': user.id})
+            serializer.is_valid(raise_exception=True)
+            try:
+                serializer.save()
+            except ValidationError:
+                out_of_stock.append(1)
+
+        errors = run_in_threads(checkout, checkouts)
+
+        self.assertEqual(errors, [])
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, 0)
+        self.assertEqual(Order.objects.count(), stock)
+        self.assertEqual(OrderItem.objects.filter(product=product).count(), stock)
+        self.assertEqual(len(out_of_stock), checkouts - stock)
+
+
+class ProductResponseCacheTests(TestCase):
+    def setUp(self):
+        # responses and versions live in the cache, which the test transaction doesn't roll back.
+        cache.clear()
+        self.product, = create_products(1)
+        self.client = APIClient()
+
+    def test_a_cached_list_is_replaced_once_a_product_change_commits(self):
+        first = self.client.get('/store/products/')
+        second = self.client.get('/store/products/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+
+        self.product.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+
+        response = self.client.get('/store/products/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['title'], 'Renamed')
+
+    def test_the_query_string_is_part_of_the_key(self):
+        self.client.get('/store/products/?ordering=unit_price&page=1')
+        self.assertEqual(self.client.get('/store/products/?page=1&ordering=unit_price')['X-Cache'], 'HIT')
+        self.assertEqual(self.client.get('/store/products/?ordering=-unit_price')['X-Cache'], 'MISS')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # prices repeat, so pages must break ties on the id.
+        self.products = create_products(25)
+        for n, product in enumerate(self.products):
+            Product.objects.filter(pk=product.pk).update(unit_price=Decimal(10 + n % 3))
+        self.client = APIClient()
+
+    def walk(self, url, link):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn('count', response.data)
+            ids.append([product['id'] for product in response.data['results']])
+            url = response.data[link]
+        return ids
+
+    def test_pages_cover_every_row_once_in_order(self):
+        # the id follows the direction of the ordering field, so one comparison seeks past both.
+        expected = list(Product.objects.order_by('-unit_price', '-id').values_list('id', flat=True))
+        pages = self.walk('/store/products/?cursor=&ordering=-unit_price', 'next')
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_links_walk_back_through_the_same_pages(self):
+        pages = self.walk('/store/products/?cursor=&ordering=-unit_price', 'next')
+        last_page = self.client.get('/store/products/?cursor=&ordering=-unit_price')
+        while last_page.data['next']:
+            last_page = self.client.get(last_page.data['next'])
+        backwards = self.walk(last_page.data['previous'], 'previous')
+        self.assertEqual(backwards, pages[-2::-1])
+
+    def test_an_invalid_cursor_is_not_found(self):
+        self.assertEqual(self.client.get('/store/products/?cursor=bm90LWEtY3Vyc29y').status_code, 404)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # the in-memory index is built on first use; a new one reads this test's rows.
+        _get_index.cache_clear()
+        self.collection = Collection.objects.create(title='Test')
+        self.client = APIClient()
+
+    def create_product(self, title, description=''):
+        return Product.objects.create(title=title, slug='product', description=description,
+                                      unit_price=Decimal('10.00'), inventory=10, collection=self.collection)
+
+    def search(self, query, page=1):
+        response = self.client.get('/store/products/', {'search': query, 'page': page})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_title_matches_rank_above_description_matches(self):
+        in_description = self.create_product('Lid', 'fits the steel kettle')
+        in_title = self.create_product('Steel kettle')
+        self.create_product('Steel pan')
+
+        results = self.search('steel kett')['results']
+        self.assertEqual([product['id'] for product in results], [in_title.id, in_description.id])
+
+    def test_every_match_is_reachable_through_the_pages(self):
+        products = [self.create_product(f'Kettle {n}', 'kettle' if n % 2 else '') for n in range(15)]
+        self.create_product('Teapot')
+
+        first, second = self.search('kettle'), self.search('kettle', page=2)
+        self.assertEqual(first['count'], 15)
+        ids = [product['id'] for product in first['results'] + second['results']]
+        self.assertEqual(sorted(ids), sorted(product.id for product in products))
+        # the products matching in the description too rank first.
+        self.assertEqual(set(ids[:7]), {product.id for product in products[1::2]})
+
+    def test_a_product_saved_after_the_index_was_built_is_found(self):
+        self.create_product('Kettle')
+        self.assertEqual(self.search('teapot')['count'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            teapot = self.create_product('Teapot')
+        self.assertEqual([product['id'] for product in self.search('teapot')['results']], [teapot.id])
+
+
+class ProductTagFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.red, self.sale, self.blue = (Tag.objects.create(label=label) for label in ('red', 'Sale', 'blue'))
+        self.products = create_products(4)
+        self.tag(self.products[0], self.red, self.sale)
+        self.tag(self.products[1], self.red)
+        self.tag(self.products[2], self.blue)
+        self.client = APIClient()
+
+    def tag(self, product, *tags):
+        content_type = ContentType.objects.get_for_model(Product)
+        for tag in tags:
+            TaggedItem.objects.create(tag=tag, content_type=content_type, object_id=product.id)
+
+    def filter(self, **params):
+        response = self.client.get('/store/products/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(product['id'] for product in response.data['results'])
+
+    def test_tag_keeps_the_products_with_every_tag(self):
+        self.assertEqual(self.filter(tag='red'), [self.products[0].id, self.products[1].id])
+        self.assertEqual(self.filter(tag='RED,sale'), [self.products[0].id])
+        self.assertEqual(self.filter(tag='red,blue'), [])
+        self.assertEqual(self.filter(tag='missing'), [])
+
+    def test_tag_any_keeps_the_products_with_either_tag(self):
+        self.assertEqual(self.filter(tag_any='sale,blue'), [self.products[0].id, self.products[2].id])
+        self.assertEqual(self.filter(tag_any='missing,blue'), [self.products[2].id])
+
+    def test_the_cached_ids_follow_committed_changes(self):
+        self.assertEqual(self.filter(tag='blue'), [self.products[2].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag(self.products[3], self.blue)
+        self.assertEqual(self.filter(tag='blue'), [self.products[2].id, self.products[3].id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blue.label = 'navy'
+            self.blue.save()
+        self.assertEqual(self.filter(tag='blue'), [])
+        self.assertEqual(self.filter(tag='navy'), [self.products[2].id, self.products[3].id])
+
+    def test_invalidate_tag_cache_picks_up_bulk_changes(self):
+        self.assertEqual(self.filter(tag='blue'), [self.products[2].id])
+        TaggedItem.objects.filter(tag=self.blue).update(object_id=self.products[3].id)
+
+        call_command('invalidate_tag_cache', stdout=StringIO())
+        self.assertEqual(self.filter(tag='blue'), [self.products[3].id])
+
+
+@override_settings(STORE_CART_BACKEND='cache', ROOT_URLCONF=__name__)
+class CachedCartTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.products = create_products(2)
+        self.client = APIClient()
+
+    def create_cart(self):
+        response = self.client.post('/store/carts/')
+        self.assertEqual(response.status_code, 201)
+        return f'/store/carts/{response.data["id"]}/'
+
+    def test_items_are_added_updated_and_removed(self):
+        cart_url = self.create_cart()
+        first, second = self.products
+        for product, quantity in ((first, 2), (first, 3), (second, 1)):
+            response = self.client.post(f'{cart_url}items/', {'product_id': product.id, 'quantity': quantity})
+            self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['quantity'], 1)
+
+        response = self.client.get(cart_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({item['product']['id']: item['quantity'] for item in response.data['items']},
+                         {first.id: 5, second.id: 1})
+        self.assertEqual(Decimal(response.data['total_price']), Decimal('60.00'))
+
+        response = self.client.patch(f'{cart_url}items/{first.id}/', {'quantity': 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'{cart_url}items/{first.id}/').data['quantity'], 1)
+
+        self.assertEqual(self.client.delete(f'{cart_url}items/{second.id}/').status_code, 204)
+        self.assertEqual(self.client.get(f'{cart_url}items/{second.id}/').status_code, 404)
+        self.assertEqual([item['product']['id'] for item in self.client.get(f'{cart_url}items/').data], [first.id])
+
+    def test_an_unknown_product_is_rejected(self):
+        cart_url = self.create_cart()
+        response = self.client.post(f'{cart_url}items/', {'product_id': 0, 'quantity': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(cart_url).data['items'], [])
+
+    def test_a_deleted_cart_is_not_found(self):
+        cart_url = self.create_cart()
+        self.assertEqual(self.client.delete(cart_url).status_code, 204)
+        self.assertEqual(self.client.get(cart_url).status_code, 404)
+        self.assertEqual(self.client.delete(cart_url).status_code, 404)
+        response = self.client.post(f'{cart_url}items/', {'product_id': self.products[0].id, 'quantity': 1})
+        self.assertEqual(response.status_code, 404)
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.products = create_products(10)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, cart_id):
+        return CreateOrderSerializer(data={'cart_id': str(cart_id)}, context={'user_id': self.user.id})
+
+    def test_checkout_queries_do_not_grow_with_the_cart(self):
+        # the cart lines (validated, then locked), the products (locked, then updated), the customer,
+        # the order, its items, the cart (read, its items deleted, deleted), the outbox event and the
+        # savepoint of the test transaction; plus reading the item ids back without RETURNING.
+        budget = 13 + (not connection.features.can_return_rows_from_bulk_insert)
+        for size in (1, len(self.products)):
+            cart = create_cart(self.products[:size])
+            with self.assertNumQueries(budget):
+                response = self.client.post('/store/orders/', {'cart_id': str(cart.id)}, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data['items']), size)
+            self.assertEqual(response.data['customer']['user_id'], self.user.id)
+
+    def test_a_cart_is_checked_out_once(self):
+        product = self.products[0]
+        cart = create_cart([product], quantity=3)
+        first, second = self.checkout(cart.id), self.checkout(cart.id)
+        self.assertTrue(first.is_valid())
+        self.assertTrue(second.is_valid())
+
+        first.save()
+        with self.assertRaises(ValidationError):
+            second.save()
+
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, 97)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(STORE_CART_BACKEND='cache')
+    def test_a_cached_cart_is_checked_out_once(self):
+        product = self.products[0]
+        store = get_cart_store()
+        cart = store.create()
+        store.add_item(cart.id, product.id, 3)
+        first, second = self.checkout(cart.id), self.checkout(cart.id)
+        self.assertTrue(first.is_valid())
+        self.assertTrue(second.is_valid())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        with self.assertRaises(ValidationError):
+            second.save()
+
+        product.refresh_from_db()
+        self.assertEqual(product.inventory, 97)
+        self.assertEqual(Order.objects.count(), 1)
+
+    @override_settings(STORE_CART_BACKEND='cache')
+    def test_a_failed_checkout_releases_a_cached_cart(self):
+        product = self.products[0]
+        store = get_cart_store()
+        cart = store.create()
+        store.add_item(cart.id, product.id, 101)
+
+        serializer = self.checkout(cart.id)
+        self.assertTrue(serializer.is_valid())
+        with self.assertRaises(ValidationError):
+            serializer.save()
+        self.assertTrue(store.claim(cart.id))
+
+
+class OrderListQueryCountTests(TestCase):
+    def setUp(self):
+        self.products = create_products(3)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True)
+        self.client = APIClient()
+
+    def create_orders(self, count):
+        customer = Customer.objects.get(user=self.user)
+        for _ in range(count):
+            order = Order.objects.create(customer=customer)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=1, unit_price=product.unit_price)
+                for product in self.products)
+
+    def assertListQueries(self, user, num, orders):
+        self.client.force_authenticate(user)
+        with self.assertNumQueries(num):
+            response = self.client.get('/store/orders/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], orders)
+        self.assertEqual(len(response.data['results']), orders)
+        self.assertTrue(all(len(order['items']) == len(self.products) for order in response.data['results']))
+
+    def test_listing_orders_runs_the_same_queries_for_one_or_many(self):
+        # the count, the page of orders with their customers, and their items with their products.
+        self.create_orders(1)
+        for user in (self.user, self.staff):
+            self.assertListQueries(user, 3, 1)
+
+        self.create_orders(9)
+        for user in (self.user, self.staff):
+            self.assertListQueries(user, 3, 10)
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.products = create_products(2)
+        user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        customer = Customer.objects.get(user=user)
+        self.orders = []
+        for n in range(5):
+            order = Order.objects.create(customer=customer, payment_status=Order.PAYMENT_STATUS_COMPLETE if n % 2 else Order.PAYMENT_STATUS_PENDING)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, product=product, quantity=n + 1, unit_price=product.unit_price)
+                for product in self.products)
+            self.orders.append(order)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', 'staff@example.com', 'password', is_staff=True))
+
+    def export(self, path, **params):
+        response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode(), response
+
+    @mock.patch.object(OrderViewSet, 'export_batch_size', 2)
+    def test_orders_are_exported_as_csv_across_batches(self):
+        content, response = self.export('/store/orders/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="orders.csv"')
+
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0], ['id', 'placed_at', 'payment_status', 'customer_id', 'items_count', 'total'])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [order.id for order in self.orders])
+        self.assertEqual([(row[4], Decimal(row[5])) for row in rows[1:]],
+                         [('2', Decimal(20 * n)) for n in range(1, 6)])
+
+    def test_order_items_are_exported_as_ndjson_with_the_filters(self):
+        content, response = self.export('/store/orders/export-items/', output='ndjson', payment_status=Order.PAYMENT_STATUS_COMPLETE)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['order_id'] for row in rows],
+                         [order.id for order in self.orders if order.payment_status == Order.PAYMENT_STATUS_COMPLETE for _ in self.products])
+        self.assertEqual(rows[0]['product__title'], self.products[0].title)
+        self.assertEqual(rows[0]['quantity'], 2)
+
+    def test_an_unknown_output_is_rejected(self):
+        self.assertEqual(self.client.get('/store/orders/export/', {'output': 'xml'}).status_code, 400)
+
+    def test_customers_cannot_export(self):
+        self.client.force_authenticate(User.objects.get(username='buyer'))
+        self.assertEqual(self.client.get('/store/orders/export/').status_code, 403)
+
+
+class IdempotencyKeyTests(TestCase):
+    def setUp(self):
+        self.product, = create_products(1)
+        self.user = User.objects.create_user('buyer', 'buyer@example.com', 'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, cart_id, key='checkout-1'):
+        return self.client.post('/store/orders/', {'cart_id': str(cart_id)}, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_a_retry_replays_the_first_response(self):
+        cart = create_cart([self.product], quantity=2)
+        first = self.checkout(cart.id)
+        retry = self.checkout(cart.id)
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(retry.status_code, 200)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(Order.objects.count(), 1)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.inventory, 98)
+
+    def test_reusing_a_key_with_another_body_is_rejected(self):
+        self.assertEqual(self.checkout(create_cart([self.product]).id).status_code, 200)
+        response = self.checkout(create_cart([self.product]).id)
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_failed_responses_are_not_stored(self):
+        cart = create_cart([self.product], quantity=101)
+        self.assertEqual(self.checkout(cart.id).status_code, 400)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        CartItem.objects.filter(cart=cart).update(quantity=1)
+        response = self.checkout(cart.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+
+    def test_an_expired_key_runs_the_request_again(self):
+        self.assertEqual(self.checkout(create_cart([self.product]).id).status_code, 200)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+
+        response = self.checkout(create_cart([self.product]).id)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Order.objects.count(), 2)
+        self.assertEqual(IdempotencyKey.objects.count(), 1)
@@ -2,11 +2,15 @@ from django.urls import path
 from django.urls.conf import include
 from rest_framework_nested import routers
 from . import views
+from .carts import cart_store_enabled
 
 router = routers.DefaultRouter()
 router.register('products', views.ProductViewSet, basename='products')
 router.register('collections', views.CollectionViewSet)
-router.register('carts', views.CartViewSet)
+if cart_store_enabled():
+    router.register('carts', views.CachedCartViewSet, basename='cart')
+else:
+    router.register('carts', views.CartViewSet)
 router.register('customers', views.CustomerViewSet)
 router.register("orders", views.OrderViewSet, basename="orders")
 
@@ -17,7 +21,10 @@ products_router.register('reviews', views.ReviewViewSet,
                          basename='product-reviews')
 
 carts_router = routers.NestedDefaultRouter(router, 'carts', lookup='cart')
-carts_router.register('items', views.CartItemViewSet, basename='cart-items')
+carts_router.register(
+    'items',
+    views.CachedCartItemViewSet if cart_store_enabled() else views.CartItemViewSet,
+    basename='cart-items')
 
 # URLConf
 urlpatterns = router.urls + products_router.urls + carts_router.urls
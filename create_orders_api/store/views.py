@@ -1,32 +1,60 @@
 from multiprocessing import context
+from store.caching import CachedResponseMixin
+from store.exports import RENDERERS, iterate_rows
+from store.carts import get_cart_store
+from store.idempotency import idempotent
 from store.permissions import FullDjangoModelPermissions, IsAdminOrReadOnly, ViewCustomerHistoryPermission
-from store.pagination import DefaultPagination
-from django.db.models.aggregates import Count
+from store.pagination import DefaultPagination, ExactCountPagination, KeysetPagination
+from store.pricing import annotate_price_with_tax
+from tags.models import Tag, TaggedItem, prefetch_tags
+from decimal import Decimal
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework.decorators import action, permission_classes
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.mixins import CreateModelMixin, DestroyModelMixin, RetrieveModelMixin, UpdateModelMixin
 from rest_framework.permissions import AllowAny, DjangoModelPermissions, DjangoModelPermissionsOrAnonReadOnly, IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework import status
-from .filters import ProductFilter
-from .models import Cart, CartItem, Collection, Customer, OrderItem, Product, Review, Order
+from .filters import FullTextSearchFilter, OrderExportFilter, ProductFilter
+from .models import Cart, CartItem, Collection, Customer, OrderItem, Product, Promotion, Review, Order
 from .serializers import (AddCartItemSerializer, CartItemSerializer, CartSerializer, CollectionSerializer,
-                          CustomerSerializer, OrderSerializer, ProductSerializer, ReviewSerializer,
+                          CreatedOrderSerializer, CustomerSerializer, OrderSerializer, ProductSerializer, ReviewSerializer,
                           UpdateCartItemSerializer, CreateOrderSerializer, UpdateOrderSerializer)
 
 
-class ProductViewSet(ModelViewSet):
+class ProductViewSet(CachedResponseMixin, ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
     filterset_class = ProductFilter
     pagination_class = DefaultPagination
     permission_classes = [IsAdminOrReadOnly]
-    search_fields = ['title', 'description']
     ordering_fields = ['unit_price', 'last_update']
+    cache_models = [Product, Collection, Promotion, Tag, TaggedItem]
+
+    # "?cursor=" switches the listing to keyset pagination (no OFFSET, no COUNT).
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if KeysetPagination.cursor_query_param in self.request.query_params:
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def paginate_queryset(self, queryset):
+        # the tags of the whole page are read with one query.
+        page = super().paginate_queryset(queryset)
+        return page if page is None else prefetch_tags(page)
+
+    def get_queryset(self):
+        return annotate_price_with_tax(super().get_queryset(), self.request.query_params.get('region'))
 
     def get_serializer_context(self):
         return {'request': self.request}
@@ -40,8 +68,7 @@ class ProductViewSet(ModelViewSet):
 
 
 class CollectionViewSet(ModelViewSet):
-    queryset = Collection.objects.annotate(
-        products_count=Count('products')).all()
+    queryset = Collection.objects.all()
     serializer_class = CollectionSerializer
     permission_classes = [IsAdminOrReadOnly]
 
@@ -63,11 +90,26 @@ class ReviewViewSet(ModelViewSet):
         return {'product_id': self.kwargs['product_pk']}
 
 
+# line and cart totals are computed by the database, the serializers only read them.
+def cart_items_with_total_price():
+    return CartItem.objects \
+        .select_related('product') \
+        .annotate(total_price=ExpressionWrapper(
+            F('quantity') * F('product__unit_price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)))
+
+
 class CartViewSet(CreateModelMixin,
                   RetrieveModelMixin,
                   DestroyModelMixin,
                   GenericViewSet):
-    queryset = Cart.objects.prefetch_related('items__product').all()
+    queryset = Cart.objects \
+        .prefetch_related(Prefetch('items', queryset=cart_items_with_total_price())) \
+        .annotate(total_price=Coalesce(
+            Sum(F('items__quantity') * F('items__product__unit_price'),
+                output_field=DecimalField(max_digits=15, decimal_places=2)),
+            Value(Decimal(0)),
+            output_field=DecimalField(max_digits=15, decimal_places=2)))
     serializer_class = CartSerializer
 
 
@@ -84,10 +126,99 @@ class CartItemViewSet(ModelViewSet):
     def get_serializer_context(self):
         return {'cart_id': self.kwargs['cart_pk']}
 
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+
     def get_queryset(self):
-        return CartItem.objects \
-            .filter(cart_id=self.kwargs['cart_pk']) \
-            .select_related('product')
+        return cart_items_with_total_price().filter(cart_id=self.kwargs['cart_pk'])
+
+
+class CachedCartViewSet(GenericViewSet):
+    """
+    Same API as CartViewSet, for carts kept in the cache (settings.STORE_CART_BACKEND = 'cache').
+    """
+    serializer_class = CartSerializer
+
+    def get_object(self):
+        cart = get_cart_store().get(self.kwargs['pk'])
+        if cart is None:
+            raise Http404
+        return cart
+
+    def create(self, request):
+        cart = get_cart_store().create()
+        return Response(CartSerializer(cart).data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk):
+        return Response(CartSerializer(self.get_object()).data)
+
+    def destroy(self, request, pk):
+        if not get_cart_store().delete(pk):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CachedCartItemViewSet(GenericViewSet):
+    """
+    Same API as CartItemViewSet, for carts kept in the cache.
+    The id of an item is the id of its product.
+    """
+    http_method_names = ['get', 'post', 'patch', 'delete']
+
+    def get_serializer_class(self):
+        if self.request.method == 'POST':
+            return AddCartItemSerializer
+        elif self.request.method == 'PATCH':
+            return UpdateCartItemSerializer
+        return CartItemSerializer
+
+    def get_product_id(self):
+        try:
+            return int(self.kwargs['pk'])
+        except ValueError:
+            raise Http404
+
+    def get_object(self):
+        item = get_cart_store().get_item(self.kwargs['cart_pk'], self.get_product_id())
+        if item is None:
+            raise Http404
+        return item
+
+    def list(self, request, cart_pk):
+        cart = get_cart_store().get(cart_pk)
+        if cart is None:
+            raise Http404
+        return Response(CartItemSerializer(cart.items, many=True).data)
+
+    def retrieve(self, request, cart_pk, pk):
+        return Response(CartItemSerializer(self.get_object()).data)
+
+    @idempotent
+    def create(self, request, cart_pk):
+        serializer = AddCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        product_id = serializer.validated_data['product_id']
+        if not Product.objects.filter(pk=product_id).exists():
+            raise ValidationError({'product_id': ['No product with the given ID was found.']})
+        quantity = get_cart_store().add_item(cart_pk, product_id, serializer.validated_data['quantity'])
+        if quantity is None:
+            raise Http404
+        return Response({'id': product_id, 'product_id': product_id, 'quantity': quantity},
+                        status=status.HTTP_201_CREATED)
+
+    def partial_update(self, request, cart_pk, pk):
+        serializer = UpdateCartItemSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        quantity = serializer.validated_data['quantity']
+        if not get_cart_store().set_quantity(cart_pk, self.get_product_id(), quantity):
+            raise Http404
+        return Response({'quantity': quantity})
+
+    def destroy(self, request, cart_pk, pk):
+        if not get_cart_store().remove_item(cart_pk, self.get_product_id()):
+            raise Http404
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class CustomerViewSet(ModelViewSet):
@@ -101,7 +232,7 @@ class CustomerViewSet(ModelViewSet):
 
     @action(detail=False, methods=['GET', 'PUT'], permission_classes=[IsAuthenticated])
     def me(self, request):
-        customer = Customer.objects.get(user_id=request.user.id)
+        customer = get_object_or_404(Customer, user_id=request.user.id)
         if request.method == 'GET':
             serializer = CustomerSerializer(customer)
             return Response(serializer.data)
@@ -114,19 +245,24 @@ class CustomerViewSet(ModelViewSet):
 
 class OrderViewSet(ModelViewSet):
     http_method_names = ["get", "post", "patch", "delete", "head", "options"]
+    # a customer sees the order they just placed in the count, which isn't cached.
+    pagination_class = ExactCountPagination
+
+    export_batch_size = 2000
 
     def get_permissions(self):
-        if self.request.method in ["PATCH", "DELETE"]:
+        if self.request.method in ["PATCH", "DELETE"] or self.action in ["export", "export_items"]:
             return [IsAdminUser()]
         return [IsAuthenticated()]
 
     # an order object is created and saved in the database using a serializer.
     # then the same object is returned back using another serializer.
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateOrderSerializer(data=request.data, context={"user_id": self.request.user.id})
         serializer.is_valid(raise_exception=True)
         order = serializer.save()
-        serializer = OrderSerializer(order)
+        serializer = CreatedOrderSerializer(order, context={"items": serializer.order_items})
         return Response(serializer.data)
 
     def get_serializer_class(self):
@@ -138,8 +274,54 @@ class OrderViewSet(ModelViewSet):
 
     def get_queryset(self):
         # for admin, return all the orders; For users, return only their orders which they have been placed.
+        # OrderSerializer nests the customer and the items with their product, so a page of orders
+        # costs three queries whatever its size, each loading only the serialized columns.
+        queryset = Order.objects \
+            .select_related('customer') \
+            .prefetch_related(Prefetch(
+                'items',
+                queryset=OrderItem.objects
+                .select_related('product')
+                .only('id', 'order_id', 'quantity', 'unit_price', 'product__id', 'product__title', 'product__unit_price'))) \
+            .only('id', 'placed_at', 'payment_status', 'customer__id', 'customer__user_id',
+                  'customer__phone', 'customer__birth_date', 'customer__membership') \
+            .order_by('-id')
         if self.request.user.is_staff:
-            return Order.objects.all()
-        customer_object = Customer.objects.get(user_id=self.request.user.id)
-        customer_id = customer_object.id
-        return Order.objects.filter(customer_id = customer_id)
\ No newline at end of file
+            return queryset
+        # the customer is joined already, so filtering on its user costs no extra query.
+        return queryset.filter(customer__user_id=self.request.user.id)
+
+    def get_export_orders(self):
+        filterset = OrderExportFilter(self.request.query_params, queryset=Order.objects.all())
+        if not filterset.is_valid():
+            raise ValidationError(filterset.errors)
+        return filterset.qs
+
+    def stream_export(self, queryset, fields, filename):
+        # "output" rather than "format", which DRF keeps for picking a renderer.
+        output = self.request.query_params.get("output", "csv")
+        if output not in RENDERERS:
+            raise ValidationError({"output": [f"Choose one of: {', '.join(RENDERERS)}."]})
+        render, content_type = RENDERERS[output]
+        rows = iterate_rows(queryset, fields, batch_size=self.export_batch_size)
+        response = StreamingHttpResponse(render(rows, fields), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="{filename}.{output}"'
+        return response
+
+    # the exports stream plain rows straight from the database instead of building
+    # every OrderSerializer representation in memory first.
+    @action(detail=False)
+    def export(self, request):
+        queryset = self.get_export_orders().annotate(
+            items_count=Count("items"),
+            total=Sum(ExpressionWrapper(F("items__quantity") * F("items__unit_price"),
+                                        output_field=DecimalField(max_digits=12, decimal_places=2))))
+        fields = ["id", "placed_at", "payment_status", "customer_id", "items_count", "total"]
+        return self.stream_export(queryset, fields, "orders")
+
+    @action(detail=False, url_path="export-items")
+    def export_items(self, request):
+        queryset = OrderItem.objects.filter(order__in=self.get_export_orders().values("pk"))
+        fields = ["id", "order_id", "order__placed_at", "order__payment_status",
+                  "product_id", "product__title", "quantity", "unit_price"]
+        return self.stream_export(queryset, fields, "order-items")
@@ -100,6 +100,20 @@ DATABASES = {
     }
 }
 
+# Every process serving the API must see the same cache: a token revoked in one
+# (core/authentication.py) has to be rejected by all of them, and a permission change
+# has to invalidate the permissions they cached (core/backends.py), and the likes they
+# record are written to the database by "python manage.py flush_like_counts", another
+# process (likes/counters.py). Django's default LocMemCache is private to each process,
+# so a shared backend is required here: the system checks core.W001 and likes.W001
+# report a process-local one.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6379/1',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -146,8 +160,10 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'COERCE_DECIMAL_TO_STRING': False,
+    # request.user is built from the token claims, and revoked tokens are rejected
+    # everywhere (see core/authentication.py).
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.StatelessJWTAuthentication',
     ),
 }
 
@@ -160,7 +176,35 @@ DJOSER = {
     }
 }
 
+# Tax rate per region, applied to product prices. Products are priced with the
+# 'default' rate unless the request asks for another region with "?region=".
+STORE_TAX_RATES = {
+    'default': '0.10',
+}
+
+# Backs "?search=" on the products endpoint (see store/search.py).
+STORE_SEARCH_INDEX = 'store.search.MySQLFullTextIndex'
+
+# 'database' keeps carts in the store_cart/store_cartitem tables, 'cache' keeps them
+# in the default cache (see store/carts.py) until checkout. Cached carts expire
+# STORE_CART_TIMEOUT seconds after their last change.
+STORE_CART_BACKEND = 'database'
+STORE_CART_TIMEOUT = 60 * 60 * 24 * 7
+
+# How long, in seconds, a response sent with an Idempotency-Key header is replayed
+# to retries of the same request (see store/idempotency.py).
+STORE_IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+
+# Same as django's ModelBackend, with the permissions of each user cached (see core/backends.py).
+AUTHENTICATION_BACKENDS = [
+    'core.backends.CachedModelBackend',
+]
+
 SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('JWT',),
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=1)
+    'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
+    # tokens carry the claims the store endpoints authenticate from (see core/authentication.py).
+    'TOKEN_OBTAIN_SERIALIZER': 'core.serializers.TokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'core.serializers.TokenRefreshSerializer',
+    'TOKEN_USER_CLASS': 'core.authentication.ClaimsTokenUser',
 }
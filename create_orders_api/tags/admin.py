@@ -1,5 +1,6 @@
 from django.contrib import admin
 from .models import Tag
+from .search import get_tag_index
 
 # Register your models here.
 
@@ -7,3 +8,12 @@ from .models import Tag
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
     search_fields = ['label']
+    # the most tags a search (the changelist's or TagInline's autocomplete) returns.
+    search_limit = 1000
+
+    def get_search_results(self, request, queryset, search_term):
+        # matches words starting with the term from the in-memory index instead of label LIKE '%term%'.
+        if not search_term.strip():
+            return queryset, False
+        tag_ids = [tag_id for tag_id, _ in get_tag_index().search(search_term, limit=self.search_limit)]
+        return queryset.filter(pk__in=tag_ids), False
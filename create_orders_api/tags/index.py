@@ -0,0 +1,99 @@
+import hashlib
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.db.models import Q
+from store.caching import bump_version, get_version
+from .models import Tag, TaggedItem
+
+
+LABEL_KEY = 'tags:label:%s:%s'
+OBJECTS_KEY = 'tags:objects:%s:%s:%s'
+# the id sets are keyed on these versions, bumped by tags.signals.handlers once a change
+# commits: a request that read the rows before that caches them under the old version,
+# which nothing reads anymore. Entries also expire, in case of changes made without signals.
+LABELS_VERSION = 'tag_labels'
+OBJECTS_VERSION = 'tagged_objects'
+TIMEOUT = 60 * 60
+
+
+def label_key(version, label):
+    return LABEL_KEY % (version, hashlib.md5(label.lower().encode()).hexdigest())
+
+
+def objects_key(version, content_type_id, tag_id):
+    return OBJECTS_KEY % (version, content_type_id, tag_id)
+
+
+def invalidate():
+    """
+    Drops every cached id set, for changes made without signals (bulk_create, update(), raw SQL).
+    """
+    bump_version(LABELS_VERSION)
+    bump_version(OBJECTS_VERSION)
+
+
+def get_tag_ids(labels):
+    """
+    Returns {label: set of ids of the tags with that label}, case insensitive.
+    Labels missing from the cache are read with one query.
+    """
+    version = get_version(LABELS_VERSION)
+    keys = {label: label_key(version, label) for label in labels}
+    cached = cache.get_many(keys.values())
+    tag_ids = {label: cached[key] for label, key in keys.items() if key in cached}
+
+    missing = [label for label in labels if label not in tag_ids]
+    if missing:
+        found = {label.lower(): set() for label in missing}
+        condition = Q()
+        for label in missing:
+            condition |= Q(label__iexact=label)
+        for tag_id, label in Tag.objects.filter(condition).values_list('id', 'label'):
+            found.setdefault(label.lower(), set()).add(tag_id)
+        for label in missing:
+            tag_ids[label] = found[label.lower()]
+        cache.set_many({keys[label]: tag_ids[label] for label in missing}, timeout=TIMEOUT)
+    return tag_ids
+
+
+def get_object_ids(model, tag_ids):
+    """
+    Returns {tag id: set of ids of the `model` objects with that tag}.
+    Tags missing from the cache are read with one query.
+    """
+    content_type_id = ContentType.objects.get_for_model(model).id
+    version = get_version(OBJECTS_VERSION)
+    keys = {tag_id: objects_key(version, content_type_id, tag_id) for tag_id in tag_ids}
+    cached = cache.get_many(keys.values())
+    object_ids = {tag_id: cached[key] for tag_id, key in keys.items() if key in cached}
+
+    missing = [tag_id for tag_id in tag_ids if tag_id not in object_ids]
+    if missing:
+        for tag_id in missing:
+            object_ids[tag_id] = set()
+        rows = TaggedItem.objects \
+            .filter(content_type_id=content_type_id, tag_id__in=missing) \
+            .values_list('tag_id', 'object_id')
+        for tag_id, object_id in rows:
+            object_ids[tag_id].add(object_id)
+        cache.set_many({keys[tag_id]: object_ids[tag_id] for tag_id in missing}, timeout=TIMEOUT)
+    return object_ids
+
+
+def filter_by_tags(queryset, labels, match_all=True):
+    """
+    Keeps the objects tagged with every label (match_all) or with any of them, by
+    intersecting or joining the cached id sets instead of joining store_taggeditem.
+    """
+    labels = [label.strip() for label in labels if label.strip()]
+    if not labels:
+        return queryset
+
+    tag_ids = get_tag_ids(labels)
+    object_ids = get_object_ids(queryset.model, set().union(*tag_ids.values()))
+    # an object matches a label through any of the tags carrying that label.
+    matches = [set().union(*(object_ids[tag_id] for tag_id in tag_ids[label])) for label in labels]
+    ids = set.intersection(*matches) if match_all else set.union(*matches)
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids)
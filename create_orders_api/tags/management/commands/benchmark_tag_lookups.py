@@ -0,0 +1,84 @@
+import random
+import statistics
+import time
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from tags.models import Tag, TaggedItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Fills tags_taggeditem up to --rows benchmark rows, then times "tags of this object" '
+        'lookups with the (content_type, object_id) index and with that index dropped. '
+        'Run it against a scratch database (see --database): the rows are left in place so it '
+        'can be re-run, and the index is rebuilt at the end, which takes a while on a big table. '
+        'The index changes are DDL, which MySQL commits at once, so unlike the other benchmarks '
+        'the run can\'t be rolled back: it asks for confirmation first.'
+    )
+    label = 'benchmark'
+    objects_per_tag = 5
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000_000,
+                            help='Number of tagged rows to benchmark against (default: 10000000).')
+        parser.add_argument('--lookups', type=int, default=200,
+                            help='Number of lookups timed per run (default: 200).')
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows inserted per query while filling the table (default: 10000).')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS,
+                            help='Database to benchmark (default: "default").')
+        parser.add_argument('--noinput', '--no-input', action='store_false', dest='interactive',
+                            help='Do not ask for confirmation.')
+
+    def handle(self, *args, **options):
+        database = options['database']
+        if options['interactive']:
+            name = connections[database].settings_dict['NAME']
+            answer = input(
+                f'This inserts up to {options["rows"]} rows into {TaggedItem._meta.db_table} and drops '
+                f'and rebuilds one of its indexes on the database "{name}" ({database}).\n'
+                f"Type 'yes' to continue, or 'no' to cancel: ")
+            if answer != 'yes':
+                raise CommandError('Benchmark cancelled.')
+
+        tag, _ = Tag.objects.using(database).get_or_create(label=self.label)
+        content_type = ContentType.objects.db_manager(database).get_for_model(Tag)
+        object_count = max(1, options['rows'] // self.objects_per_tag)
+        self.fill(database, tag, content_type, options['rows'], object_count, options['batch_size'])
+
+        index = next(index for index in TaggedItem._meta.indexes if index.fields == ['content_type', 'object_id'])
+        self.run(database, 'with index', content_type, object_count, options['lookups'])
+        with connections[database].schema_editor() as schema_editor:
+            schema_editor.remove_index(TaggedItem, index)
+        try:
+            self.run(database, 'without index', content_type, object_count, options['lookups'])
+        finally:
+            self.stdout.write('Rebuilding the index...')
+            with connections[database].schema_editor() as schema_editor:
+                schema_editor.add_index(TaggedItem, index)
+
+    def fill(self, database, tag, content_type, rows, object_count, batch_size):
+        existing = TaggedItem.objects.using(database).filter(tag=tag).count()
+        started = time.monotonic()
+        for start in range(existing, rows, batch_size):
+            TaggedItem.objects.using(database).bulk_create([
+                TaggedItem(tag=tag, content_type=content_type, object_id=n % object_count + 1)
+                for n in range(start, min(start + batch_size, rows))
+            ])
+        if rows > existing:
+            self.stdout.write(f'Inserted {rows - existing} rows in {time.monotonic() - started:.1f}s.')
+
+    def run(self, database, name, content_type, object_count, lookups):
+        timings = []
+        for _ in range(lookups):
+            object_id = random.randint(1, object_count)
+            started = time.perf_counter()
+            list(TaggedItem.objects.get_tags_for(Tag, object_id).using(database))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        self.stdout.write(
+            f'{name}: median {statistics.median(timings):.2f}ms, '
+            f'p95 {timings[min(len(timings) - 1, int(len(timings) * 0.95))]:.2f}ms '
+            f'over {lookups} lookups.')
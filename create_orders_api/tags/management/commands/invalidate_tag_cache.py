@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from store.caching import bump_table_version
+from tags import index, search
+from tags.models import Tag, TaggedItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Drops the cached tag lookups (the ?tag= id sets, the autocomplete index of every '
+        'process and the cached product responses that include tags), after tags were '
+        'changed without signals: bulk_create, update(), queryset deletes or raw SQL.'
+    )
+
+    def handle(self, *args, **options):
+        index.invalidate()
+        search.bump_version()
+        bump_table_version(Tag)
+        bump_table_version(TaggedItem)
+        self.stdout.write(self.style.SUCCESS('Invalidated the cached tag lookups.'))
@@ -14,6 +14,20 @@ class TaggedItemManager(models.Manager):
                 object_id=obj_id
             )
 
+    def get_tags_for_many(self, obj_type, obj_ids):
+        """
+        Returns {object id: [tags]} for the objects of `obj_type` with the given ids,
+        from a single query. Objects without tags are left out.
+        """
+        content_type = ContentType.objects.get_for_model(obj_type)
+        tags = {}
+        rows = self.filter(content_type=content_type, object_id__in=list(obj_ids)) \
+            .order_by('tag__label', 'tag_id') \
+            .values_list('object_id', 'tag_id', 'tag__label')
+        for object_id, tag_id, label in rows:
+            tags.setdefault(object_id, []).append(Tag(id=tag_id, label=label))
+        return tags
+
 
 class Tag(models.Model):
     label = models.CharField(max_length=255)
@@ -28,3 +42,22 @@ class TaggedItem(models.Model):
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
     object_id = models.PositiveIntegerField()
     content_object = GenericForeignKey()
+
+    class Meta:
+        indexes = [
+            # "tags of these objects" lookups (get_tags_for, get_tags_for_many).
+            models.Index(fields=['content_type', 'object_id'], name='tags_item_object_idx'),
+        ]
+
+
+def prefetch_tags(objects, to_attr='tags'):
+    """
+    Sets `to_attr` on each object to the list of its tags, with one query for all of them.
+    """
+    objects = list(objects)
+    if not objects:
+        return objects
+    tags = TaggedItem.objects.get_tags_for_many(type(objects[0]), [obj.pk for obj in objects])
+    for obj in objects:
+        setattr(obj, to_attr, tags.get(obj.pk, []))
+    return objects
@@ -0,0 +1,152 @@
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+from functools import lru_cache
+from django.core.cache import cache
+from django.db import connection
+from .models import Tag
+
+
+VERSION_KEY = 'tags:prefix-index:version'
+WORD_START_RE = re.compile(r'\b\w')
+
+
+def get_version():
+    return cache.get_or_set(VERSION_KEY, lambda: int(time.time() * 1000), timeout=None)
+
+
+def bump_version():
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        return get_version()
+
+
+def _keys(label):
+    # one key per word of the label, from that word to the end: "Big red" -> "big red", "red".
+    label = ' '.join(label.lower().split())
+    return [label[match.start():] for match in WORD_START_RE.finditer(label)]
+
+
+class TagPrefixIndex:
+    """
+    Tag.label suffixes starting at each word, kept sorted in memory, so the tags with a
+    word starting with the query are found by bisecting instead of LIKE '%query%'.
+
+    It is built from the database on first use and updated by the Tag save/delete signals.
+    Every process holds its own copy: a change bumps a version in the cache, which a
+    search compares with its copy's at most every `version_check_interval` seconds.
+    An outdated copy is reloaded in a background thread and keeps serving searches
+    until the new one replaces it; only the first load makes a search wait.
+    """
+    version_check_interval = 1
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._entries = None    # sorted (key, tag id)
+        self._labels = {}       # tag id -> label
+        self._version = None
+        self._checked_at = None
+        self._reloading = False
+
+    def _read(self):
+        # the version is read first, so the tags read next are at least that recent.
+        version = get_version()
+        labels = dict(Tag.objects.values_list('id', 'label').iterator())
+        entries = sorted((key, tag_id) for tag_id, label in labels.items() for key in _keys(label))
+        return version, entries, labels
+
+    def _swap(self, version, entries, labels):
+        # a copy updated in place past `version` while it was read is newer, and kept.
+        if self._version is None or self._version < version:
+            self._entries, self._labels, self._version = entries, labels, version
+
+    def _reload(self):
+        try:
+            loaded = self._read()
+            with self._lock:
+                self._swap(*loaded)
+        finally:
+            with self._lock:
+                self._reloading = False
+            connection.close()
+
+    def _load(self):
+        with self._lock:
+            if self._entries is None:
+                self._swap(*self._read())
+                self._checked_at = time.monotonic()
+                return
+            now = time.monotonic()
+            if self._reloading or now - self._checked_at < self.version_check_interval:
+                return
+            self._checked_at = now
+            version = self._version
+
+        if get_version() == version:
+            return
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload, daemon=True).start()
+
+    def _remove(self, tag_id):
+        label = self._labels.pop(tag_id, None)
+        if label is None:
+            return
+        for key in _keys(label):
+            position = bisect_left(self._entries, (key, tag_id))
+            if position < len(self._entries) and self._entries[position] == (key, tag_id):
+                del self._entries[position]
+
+    def _apply(self, change):
+        # applied in place when this copy was up to date before the change,
+        # otherwise left to the reload the new version triggers.
+        version = bump_version()
+        with self._lock:
+            if self._entries is not None and self._version == version - 1:
+                change()
+                self._version = version
+
+    def update(self, tag):
+        def change():
+            self._remove(tag.pk)
+            self._labels[tag.pk] = tag.label
+            for key in _keys(tag.label):
+                insort(self._entries, (key, tag.pk))
+        self._apply(change)
+
+    def remove(self, tag_id):
+        self._apply(lambda: self._remove(tag_id))
+
+    def search(self, query, limit=10):
+        """
+        Returns up to `limit` (id, label) of the tags with a word starting with the query,
+        in alphabetical order of the matching words.
+        """
+        query = ' '.join(query.lower().split())
+        if not query:
+            return []
+
+        self._load()
+        results = []
+        seen = set()
+        with self._lock:
+            # walked by position: slicing from the match would copy the rest of the list.
+            position = bisect_left(self._entries, (query,))
+            while position < len(self._entries) and len(results) < limit:
+                key, tag_id = self._entries[position]
+                if not key.startswith(query):
+                    break
+                if tag_id not in seen:
+                    seen.add(tag_id)
+                    results.append((tag_id, self._labels[tag_id]))
+                position += 1
+        return results
+
+
+@lru_cache(maxsize=None)
+def get_tag_index():
+    return TagPrefixIndex()
@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from store.caching import bump_version
+from tags.index import LABELS_VERSION, OBJECTS_VERSION
+from tags.models import Tag, TaggedItem
+from tags.search import get_tag_index
+
+
+# the versions of the cached id sets of tags.index are bumped once the change is committed.
+# a request that read the rows before then can only cache them under the old version.
+@receiver([post_save, post_delete], sender=TaggedItem)
+def invalidate_tagged_objects(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(OBJECTS_VERSION))
+
+
+@receiver([post_save, post_delete], sender=Tag)
+def invalidate_tag_labels(sender, **kwargs):
+    transaction.on_commit(lambda: bump_version(LABELS_VERSION))
+
+
+@receiver(post_save, sender=Tag)
+def index_tag(sender, **kwargs):
+    tag = kwargs["instance"]
+    transaction.on_commit(lambda: get_tag_index().update(tag))
+
+
+@receiver(post_delete, sender=Tag)
+def unindex_tag(sender, **kwargs):
+    tag_id = kwargs["instance"].pk
+    transaction.on_commit(lambda: get_tag_index().remove(tag_id))
@@ -1,3 +1,41 @@
+from django.core.cache import cache
 from django.test import TestCase
+from rest_framework.test import APIClient
+from tags.models import Tag
+from tags.search import get_tag_index
 
-# Create your tests here.
+
+class TagAutocompleteTests(TestCase):
+    def setUp(self):
+        # the index is built on first use and versioned in the cache; start both afresh.
+        cache.clear()
+        get_tag_index.cache_clear()
+        self.tags = {label: Tag.objects.create(label=label)
+                     for label in ('Red', 'Big red', 'Bored', 'Reduced price', 'blue')}
+        self.client = APIClient()
+
+    def autocomplete(self, q, **params):
+        response = self.client.get('/tags/autocomplete/', {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return [tag['label'] for tag in response.data]
+
+    def test_tags_with_a_word_starting_with_the_query_are_found(self):
+        self.assertEqual(self.autocomplete('re'), ['Red', 'Big red', 'Reduced price'])
+        self.assertEqual(self.autocomplete('  BIG   r'), ['Big red'])
+        self.assertEqual(self.autocomplete('ored'), [])
+        self.assertEqual(self.autocomplete(''), [])
+
+    def test_the_limit_is_applied(self):
+        self.assertEqual(self.autocomplete('re', limit=2), ['Red', 'Big red'])
+        self.assertEqual(self.autocomplete('re', limit='many'), ['Red', 'Big red', 'Reduced price'])
+
+    def test_committed_changes_are_searchable(self):
+        self.assertEqual(self.autocomplete('gr'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tag.objects.create(label='Green')
+            self.tags['blue'].label = 'Grey'
+            self.tags['blue'].save()
+            self.tags['Red'].delete()
+        self.assertEqual(self.autocomplete('gr'), ['Green', 'Grey'])
+        self.assertEqual(self.autocomplete('re'), ['Big red', 'Reduced price'])
@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+# URLConf
+urlpatterns = [
+    path('autocomplete/', views.TagAutocompleteView.as_view(), name='tag-autocomplete'),
+]
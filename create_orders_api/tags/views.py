@@ -1,3 +1,23 @@
-from django.shortcuts import render
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from .search import get_tag_index
 
-# Create your views here.
+
+class TagAutocompleteView(APIView):
+    """
+    GET /tags/autocomplete/?q=<prefix>&limit=<n>: the tags with a word starting with
+    the prefix, from the in-memory index (see tags.search).
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        try:
+            limit = min(int(request.query_params.get('limit', self.default_limit)), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+        results = get_tag_index().search(request.query_params.get('q', ''), limit=max(limit, 1))
+        return Response([{'id': tag_id, 'label': label} for tag_id, label in results])